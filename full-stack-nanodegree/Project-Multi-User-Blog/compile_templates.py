@@ -0,0 +1,35 @@
+""" Compile Templates
+
+Author: Aron Roberts
+Version: 1.00
+Date Created: 10/18/2026
+filename: compile_templates.py
+
+Last Update:
+Date: 10/18/2026
+DESC: precompile templates/ for templating.py
+
+usage: python compile_templates.py
+
+needs jinja2 2.6, the version app.yaml selects, and no App Engine SDK.
+Writes every template in templates/ as a python module to
+templates_compiled/, run it again whenever a template changes.
+
+"""
+import os
+
+import jinja2
+
+template_dir = os.path.join(os.path.dirname(__file__), 'templates')
+compiled_dir = os.path.join(os.path.dirname(__file__), 'templates_compiled')
+
+
+def compile_templates():
+    """ writes the compiled templates, options match templating.py """
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir),
+                             autoescape=True)
+    env.compile_templates(compiled_dir, zip=None, py_compile=False)
+
+
+if __name__ == '__main__':
+    compile_templates()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#
+# Test cases for models/hashers.py, runs without the App Engine SDK
+
+from models import hashers
+
+
+def testNewHash():
+    encoded = hashers.make_password(u'alice', u'pw1')
+    if not encoded.startswith('pbkdf2_sha256$%d$' % hashers.PBKDF2_ITERATIONS):
+        raise ValueError("New hashes should use PBKDF2 and record the "
+                         "iterations.")
+    if not hashers.check_password(u'alice', u'pw1', encoded):
+        raise ValueError("check_password() should accept the password.")
+    if hashers.check_password(u'alice', u'pw2', encoded):
+        raise ValueError("check_password() should reject a wrong password.")
+    if hashers.needs_rehash(encoded):
+        raise ValueError("A current hash should not need a rehash.")
+    print("1. New hashes record their algorithm and check passwords.")
+
+
+def testWorkFactorChange():
+    encoded = hashers.PBKDF2Hasher(1000).encode(u'alice', u'pw1',
+                                                 hashers.make_salt())
+    if not hashers.check_password(u'alice', u'pw1', encoded):
+        raise ValueError("Hashes with other iterations should still check.")
+    if not hashers.needs_rehash(encoded):
+        raise ValueError("Hashes with other iterations should be rehashed.")
+    print("2. Hashes made with another work factor check and get rehashed.")
+
+
+def testLegacySalts():
+    legacy = hashers.LegacyHasher()
+    # old salts were 5 characters of string.printable
+    for salt in [u'ab,c1', u'a$b,c', u'$$$$$', u'x\t$ ,']:
+        encoded = legacy.encode(u'bob', u'pw3', salt)
+        if not isinstance(hashers.identify(encoded), hashers.LegacyHasher):
+            raise ValueError("%r should be a legacy hash." % encoded)
+        if not hashers.check_password(u'bob', u'pw3', encoded):
+            raise ValueError("Legacy hash with salt %r should check." % salt)
+        if hashers.check_password(u'bob', u'nope', encoded):
+            raise ValueError("Legacy hash should reject a wrong password.")
+        if not hashers.needs_rehash(encoded):
+            raise ValueError("Legacy hashes should be rehashed.")
+    print("3. Legacy hashes check whatever their salt holds, '$' included.")
+
+
+def testMalformed():
+    for encoded in [u'', u'nonsense', u'md5$1$x$y', u'pbkdf2_sha256$x$y']:
+        if hashers.check_password(u'bob', u'pw', encoded):
+            raise ValueError("%r should not check." % encoded)
+    print("4. Malformed hashes are rejected.")
+
+
+if __name__ == '__main__':
+    testNewHash()
+    testWorkFactorChange()
+    testLegacySalts()
+    testMalformed()
+    print("Success!  All tests pass!")
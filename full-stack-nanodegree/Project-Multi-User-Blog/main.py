@@ -4,57 +4,116 @@ Python webserver code to manage a multi-user blog
 part of UDACITY Fullstack Nano-Degree
 
 Author: Aron Roberts
-Version: 0.92
+Version: 1.11
 Date Created: 3/1/2017
 filename: main.py
 
 Last Update:
-Date: 3/4/2017
-DESC:
+Date: 10/18/2026
+DESC: cursor pagination for BlogFront and Welcome,
+      batch prefetch post and comment authors,
+      cached user lookup in Handler.initialize,
+      invalidate cached post html on like, update and delete,
+      page cache with ETag for anonymous BlogFront and PostPage,
+      likes stored as Like entities with a sharded counter,
+      dashboard totals read from UserStats,
+      batched deletes, DeletePost removes the post's comments,
+      shared jinja environment from templating.py,
+      stream logged in BlogFront, Welcome and PostPage,
+      claim usernames at signup, precompiled validators,
+      signed session token with expiry, lazy self.user,
+      paginated comments, denormalized comment counts,
+      NewPost and NewComment read and write in one batch each,
+      admin only Migrate handler starts the deferred data migrations,
+      unordered comments until a post's comments are dated,
+      Migrate creates the Username entities of older users,
+      like and comment counts of listed posts read in one batch,
+      streaming opt in through STREAM_RESPONSES, off by default,
+      streamed pages end with a notice if they fail midway,
+      cached pages stored under the generation read before rendering,
+      UserStats made at signup and backfilled by Migrate
 
 """
 
-import os
 import webapp2
-import jinja2
+import collections
+import datetime
 import hashlib
 import hmac
+import logging
+import os
 import random
 import string
 import re
+import time
 
+from google.appengine.api import memcache
 from google.appengine.ext import db
-from models.user import User
-from models.post import Post
-from models.comment import Comment
-
-template_dir = os.path.join(os.path.dirname(__file__), 'templates')
-jinja_env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir),
-                               autoescape=True)
+from google.appengine.ext import deferred
+from models.user import (User, Username, claim_usernames,
+                         finish_claim_usernames, uncache_users)
+from models.post import (Post, add_to_comment_count, prefetch_counts,
+                         update_comment_count)
+from models.comment import Comment, backfill_created
+from models.like import Like, add_like, delete_likes, migrate_liked_by
+from models.counter import CounterShard
+from models.batch import delete_all, map_all, put_batch
+from models.prefetch import prefetch_refprops
+from models.stats import (UserStats, add_to_stats, backfill_stats, run_xg,
+                          stats_key, update_stats)
+from models.cache import PageCache
+from models.hashers import constant_time_compare
+from templating import jinja_env
 
 SECRET = "Arma virumque cano, Troiae qui primus ab oris Italiam, fato profugus"
 
+# logins last this long (seconds), the expiry is signed into the token
+SESSION_TTL = 7 * 24 * 3600
+
+# contents of the signed session cookie 'uid|username|expires|signature'
+Session = collections.namedtuple('Session', 'uid username expires')
+
+# posts per page for paginated lists, ?size= may ask for up to MAX_PAGE_SIZE
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+# render_stream sends pages while they render. Off unless set to True: the
+# python27 front end buffers the whole response anyway, and errors raised
+# mid page can only be logged and noted at the end of the page
+STREAM_RESPONSES = False
+# template events rendered into each chunk of a streamed page
+STREAM_BUFFER = 4
+# ends a streamed page that failed after its headers were sent
+STREAM_ERROR = ('<div class="alert alert-danger">'
+                'Part of this page failed to load, please reload it.</div>')
+
+# signup validators
+USER_RE = re.compile(r"^[a-zA-Z0-9_-]{3,20}$")
+PASS_RE = re.compile(r"^.{3,20}$")
+EMAIL_RE = re.compile(r'^[\S]+@[\S]+\.[\S]+$')
+
+# pages served to logged out readers, dropped on every blog write
+page_cache = PageCache('page', ttl=600)
+
 
 # datastore management
 def delete_all_comments():
     """ clears Comment table"""
-    comments = Comment.all()
-    for c in comments:
-        c.delete()
+    delete_all(Comment)
 
 
 def delete_all_post():
-    """ Clears Post table """
-    posts = Post.all()
-    for p in posts:
-        p.delete()
+    """ Clears Post table and the likes of the posts """
+    delete_all(Post)
+    delete_all(Like)
+    delete_all(CounterShard)
 
 
 def delete_all_users():
     """ Clears User table """
-    users = User.all()
-    for u in users:
-        u.delete()
+    delete_all(User, hook=uncache_users)
+    delete_all(Username)
+    delete_all(UserStats)
 
 
 def clear_db():
@@ -62,6 +121,7 @@ def clear_db():
     delete_all_comments()
     delete_all_post()
     delete_all_users()
+    memcache.flush_all()
 
 
 # Handler Classes
@@ -77,6 +137,36 @@ class Handler(webapp2.RequestHandler):
         t = jinja_env.get_template(template)
         return t.render(params)
 
+    def render_stream(self, template, **params):
+        """ renders template into the response chunk by chunk
+
+        the chunks are rendered while the response is written out, so
+        the page is never held as one string. Call it last, after it
+        nothing else may be written to the response. Without
+        STREAM_RESPONSES the page is rendered before it is sent.
+        """
+        if not STREAM_RESPONSES:
+            self.render(template, **params)
+            return
+        stream = jinja_env.get_template(template).stream(params)
+        stream.enable_buffering(STREAM_BUFFER)
+        # render the first chunk now, errors before anything is sent still
+        # get webapp2's error handling and status code
+        first = next(stream, u'')
+        self.response.app_iter = self.stream_chunks(first, stream)
+
+    def stream_chunks(self, first, stream):
+        """ yields the encoded chunks of a streamed page, an error after
+        the headers are sent is logged and ends the page with a notice
+        instead of leaving it silently cut short """
+        yield first.encode('utf-8')
+        try:
+            for chunk in stream:
+                yield chunk.encode('utf-8')
+        except Exception:
+            logging.exception("error while streaming %s", self.request.path)
+            yield STREAM_ERROR
+
     def hash_str(self, s):
         """ Hash a string """
         return hmac.new(SECRET, s, hashlib.sha256).hexdigest()
@@ -87,19 +177,59 @@ class Handler(webapp2.RequestHandler):
 
     def check_secure_val(self, h):
         """ validate hash matches string """
-        val = h.split('|')[0]
-        if h == self.make_secure_val(val):
+        val = h.rsplit('|', 1)[0]
+        if constant_time_compare(h, self.make_secure_val(val)):
             return val
 
     def render(self, template, **kw):
         """ Writes out template as a str """
         self.write(self.render_str(template, **kw))
 
-    def set_secure_cookie(self, name, val):
+    def serve_cached_page(self):
+        """ answers an anonymous request from page_cache
+
+        returns True when the response was written
+        """
+        if self.session:
+            return False
+        # read before the page is queried, render_cached_page stores
+        # under it so a write made meanwhile orphans the page
+        self.page_gen = page_cache.generation()
+        page = page_cache.get(self.request.path_qs, self.page_gen)
+        if page is None:
+            return False
+        self.write_page(*page)
+        return True
+
+    def render_cached_page(self, template, **kw):
+        """ renders template, caching the page for anonymous requests,
+        call serve_cached_page first """
+        if self.session:
+            self.render_stream(template, **kw)
+            return
+        body = self.render_str(template, **kw)
+        etag = hashlib.md5(body.encode('utf-8')).hexdigest()
+        page_cache.set(self.request.path_qs, (etag, body), self.page_gen)
+        self.write_page(etag, body)
+
+    def write_page(self, etag, body):
+        """ writes body, or 304 Not Modified if the client has etag """
+        self.response.etag = etag
+        self.response.headers['Cache-Control'] = 'no-cache'
+        self.response.headers['Vary'] = 'Cookie'
+        if etag in self.request.if_none_match:
+            self.response.status_int = 304
+        else:
+            self.write(body)
+
+    def set_secure_cookie(self, name, val, max_age=None):
         """ sets a cookie with name and val """
         cookie_val = self.make_secure_val(val)
-        self.response.headers.add_header(
-            'Set-Cookie', '%s=%s; Path=/' % (name, cookie_val))
+        cookie = '%s=%s; Path=/; HttpOnly' % (name, cookie_val)
+        if max_age:
+            cookie += '; Max-Age=%d' % max_age
+        # header values must be byte strings, val is ascii
+        self.response.headers.add_header('Set-Cookie', str(cookie))
 
     def read_secure_cookie(self, name):
         """ reads a cookie with name """
@@ -107,22 +237,79 @@ class Handler(webapp2.RequestHandler):
         return cookie_val and self.check_secure_val(cookie_val)
 
     def login(self, user):
-        """ sets user_id cookie for login """
-        self.set_secure_cookie('user_id', str(user.key().id()))
+        """ sets the session cookie for login """
+        expires = int(time.time()) + SESSION_TTL
+        self.set_secure_cookie('session', '%d|%s|%d' % (
+            user.key().id(), user.username, expires), max_age=SESSION_TTL)
 
     def logout(self):
-        """ removes user_id cookie """
-        self.response.headers.add_header('Set-Cookie', 'user_id=; Path=/')
+        """ removes the session cookie """
+        self.response.headers.add_header('Set-Cookie', 'session=; Path=/')
+
+    def read_session(self):
+        """ returns the Session of a valid, unexpired cookie or None """
+        val = self.read_secure_cookie('session')
+        if not val:
+            return None
+        try:
+            uid, username, expires = val.split('|')
+            session = Session(int(uid), username, int(expires))
+        except ValueError:
+            return None
+        if session.expires < time.time():
+            return None
+        return session
+
+    @property
+    def user(self):
+        """ the logged in User, fetched on first use """
+        if self._user is None and self.session:
+            self._user = User.by_id(self.session.uid)
+        return self._user
+
+    def owns(self, author_key):
+        """ True when author_key is the logged in user, read the key with
+        Model.prop.get_value_for_datastore so nothing is fetched """
+        return bool(self.session and author_key and
+                    author_key.id() == self.session.uid)
 
     def verify_user_login(self):
         """ verify user is logged in """
-        if not self.user:
+        if not self.session:
             self.redirect("/blog/login")
 
     def redirect_to_dashboard(self):
         """ redirects to welcome page """
         self.redirect("/blog/welcome")
 
+    def fetch_page(self, query):
+        """ fetches one page of query starting at the ?cursor= param
+
+        returns the page of entities and the query string of the next
+        page, or None when this is the last page
+        """
+        try:
+            page_size = int(self.request.get('size', PAGE_SIZE))
+        except ValueError:
+            page_size = PAGE_SIZE
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+        cursor = self.request.get('cursor')
+        try:
+            # a cursor from another query is only rejected by fetch
+            query.with_cursor(cursor or None)
+            items = query.fetch(page_size)
+        except (db.BadValueError, db.BadRequestError):
+            # stale, mangled or foreign cursor, start from the first page
+            query.with_cursor(None)
+            items = query.fetch(page_size)
+        next_page = None
+        if len(items) == page_size:
+            next_page = '?cursor=%s' % query.cursor()
+            if self.request.get('size'):
+                next_page += '&size=%d' % page_size
+        return items, next_page
+
     def retrieve_post(self, post_id):
         post = Post.get_by_id(int(post_id))
         if not post:
@@ -133,8 +320,8 @@ class Handler(webapp2.RequestHandler):
     def initialize(self, *a, **kw):
         """ verify login status using cookie """
         webapp2.RequestHandler.initialize(self, *a, **kw)
-        uid = self.read_secure_cookie('user_id')
-        self.user = uid and User.get_by_id(int(uid))
+        self.session = self.read_session()
+        self._user = None
 
 
 # Registration and Login | Logout Handlers
@@ -143,18 +330,15 @@ class Registration(Handler):
 
     def valid_username(self, username):
         """ validate username """
-        user_re = re.compile(r"^[a-zA-Z0-9_-]{3,20}$")
-        return username and user_re.match(username)
+        return username and USER_RE.match(username)
 
     def valid_pw(self, pw):
         """ validate password """
-        pass_re = re.compile(r"^.{3,20}$")
-        return pw and pass_re.match(pw)
+        return pw and PASS_RE.match(pw)
 
     def valid_email(self, email):
         """ validate email """
-        email_re = re.compile(r'^[\S]+@[\S]+\.[\S]+$')
-        return email and email_re.match(email)
+        return email and EMAIL_RE.match(email)
 
     def get(self):
         if self.user:
@@ -214,6 +398,17 @@ class Registration(Handler):
                      email=email)
             u.put()
 
+            # the name may have been taken since it was checked
+            if not Username.claim(username, u):
+                u.delete()
+                params['error_user'] = error
+                params['error_user_msg'] = "username already exsists"
+                self.render('signup.html', **params)
+                return
+
+            # a new user has nothing to count, their totals start at 0
+            UserStats(key_name=str(u.key().id())).put()
+
             # log new user in and redirect to welcome
             self.login(u)
             self.redirect_to_dashboard()
@@ -253,8 +448,13 @@ class Logout(Handler):
 class BlogFront(Handler):
     """ handler for front page of blog """
     def get(self):
-        posts = Post.all().order('-created')
-        self.render('front.html', posts=posts, user=self.user)
+        if self.serve_cached_page():
+            return
+        posts, next_page = self.fetch_page(Post.all().order('-created'))
+        prefetch_refprops(posts, Post.author)
+        prefetch_counts(posts)
+        self.render_cached_page('front.html', posts=posts, user=self.user,
+                                next_page=next_page)
 
 
 class Welcome(Handler):
@@ -262,18 +462,17 @@ class Welcome(Handler):
     def get(self):
         if self.user:
 
-            # get post made by user
-            posts = self.user.posts
-            likes = 0
-
-            # calculate total likes for all posts
-            for p in posts:
-                likes = likes + p.likes
-
-            self.render("welcome.html",
-                        user=self.user,
-                        posts=posts,
-                        likes=likes)
+            # get one page of the post made by user
+            posts, next_page = self.fetch_page(
+                self.user.posts.order('-created'))
+            prefetch_refprops(posts, Post.author)
+            prefetch_counts(posts)
+
+            self.render_stream("welcome.html",
+                               user=self.user,
+                               posts=posts,
+                               stats=UserStats.for_user(self.user),
+                               next_page=next_page)
         else:
             self.redirect("/blog/login")
 
@@ -281,13 +480,26 @@ class Welcome(Handler):
 class PostPage(Handler):
     """ handler for individual post """
     def get(self, post_id):
+        if self.serve_cached_page():
+            return
 
         # retrieve post
         post = self.retrieve_post(post_id)
         if not post:
             return
 
-        self.render("permalink.html", user=self.user, post=post)
+        # retrieve a page of comments, their authors and the post's in
+        # one batch, comments of old posts may lack created until
+        # backfill_created has run, ordering by it would leave those out
+        query = post.comments
+        if post.comments_dated:
+            query = query.order('created')
+        comments, next_page = self.fetch_page(query)
+        prefetch_refprops([post] + comments, Post.author, Comment.author)
+        prefetch_counts([post])
+
+        self.render_cached_page("permalink.html", user=self.user, post=post,
+                                comments=comments, next_page=next_page)
 
 
 class NewPost(Handler):
@@ -327,8 +539,14 @@ class NewPost(Handler):
         if error_flag:
             self.render("newpost.html", **params)
         else:
-            p = Post(subject=subject, content=content, author=self.user)
-            p.put()
+            p = Post(subject=subject, content=content, author=self.user,
+                     comment_count=0, comments_dated=True)
+
+            def txn():
+                stats = db.get(stats_key(self.user.key()))
+                put_batch(p, add_to_stats(stats, posts=1)).get_result()
+            run_xg(txn)
+            page_cache.invalidate()
             self.redirect('/blog/%s' % str(p.key().id()))
 
 
@@ -343,16 +561,11 @@ class LikePost(Handler):
         if not post:
             return
 
-        liked_by = post.liked_by
-
-        # get logged in users id and username
-        uid = str(self.user.key().id())
-        username = self.user.username
-
-        # check is user is post author or previously liked the post
-        if username != post.author.username and uid not in post.liked_by:
-            post.liked_by.append(uid)
-            post.put()
+        # users cannot like their own post, add_like ignores repeat likes
+        if not post.viewer_is_author(self.user):
+            post.uncache_render()
+            if add_like(post, self.user):
+                page_cache.invalidate()
 
         self.redirect('/blog/%s' % str(post_id))
 
@@ -369,7 +582,7 @@ class UpdatePost(Handler):
             return
 
         # verify logged in user is post author
-        if self.user.username == post.author.username:
+        if self.owns(Post.author.get_value_for_datastore(post)):
             params = dict(user=self.user,
                           post=post,
                           subject=post.subject,
@@ -388,14 +601,15 @@ class UpdatePost(Handler):
             return
 
         # verify logged in user is post author
-        if self.user.username != post.author.username:
+        if not self.owns(Post.author.get_value_for_datastore(post)):
             self.redirect_to_dashboard()
+            return
 
         # get subject and content
         subject = self.request.get("subject")
         content = self.request.get("content")
 
-        params = dict(subject=subject, content=content, user=self.user)
+        params = dict(subject=subject, content=content)
 
         # error checking and validation
         error_flag = False
@@ -414,11 +628,14 @@ class UpdatePost(Handler):
             params['error_con_msg'] = "Content is required"
 
         if error_flag:
-            self.render("newpost.html", **params)
+            self.render("newpost.html", user=self.user, **params)
         else:
+            post.uncache_render()
             post.subject = subject
             post.content = content
+            post.last_modified = datetime.datetime.now()
             post.put()
+            page_cache.invalidate()
             self.redirect('/blog/%s' % str(post.key().id()))
 
 
@@ -433,8 +650,20 @@ class DeletePost(Handler):
             return
 
         # verify logged in user is post author
-        if post.author.username == self.user.username:
-            post.delete()
+        author_key = Post.author.get_value_for_datastore(post)
+        if self.owns(author_key):
+            post.uncache_render()
+            likes = post.likes
+            comments = post.num_comments
+
+            def txn():
+                post.delete()
+                update_stats(author_key, likes=-likes, posts=-1,
+                             comments=-comments)
+            run_xg(txn)
+            delete_likes(post)
+            delete_all(Comment, [('post =', post.key())])
+            page_cache.invalidate()
 
         self.redirect_to_dashboard()
 
@@ -463,7 +692,16 @@ class NewComment(Handler):
 
         if comment:
             c = Comment(comment=comment, post=post, author=self.user)
-            c.put()
+            legacy_count = post.num_comments
+            author_stats_key = stats_key(
+                Post.author.get_value_for_datastore(post))
+
+            def txn():
+                fresh_post, stats = db.get([post.key(), author_stats_key])
+                put_batch(c, add_to_comment_count(fresh_post, 1, legacy_count),
+                          add_to_stats(stats, comments=1)).get_result()
+            run_xg(txn)
+            page_cache.invalidate()
             self.redirect('/blog/%s' % str(post_id))
         else:
             self.render("newcomment.html", user=self.user, post=post)
@@ -475,8 +713,21 @@ class DeleteComment(Handler):
 
         comment = Comment.get_by_id(int(comment_id))
 
-        if comment and comment.author.username == self.user.username:
-            comment.delete()
+        if comment and self.owns(
+                Comment.author.get_value_for_datastore(comment)):
+            post_key = Comment.post.get_value_for_datastore(comment)
+            post = Post.get(post_key)
+            legacy_count = post and post.num_comments
+
+            def txn():
+                comment.delete()
+                # comments of a deleted post were subtracted with the post
+                post = update_comment_count(post_key, -1, legacy_count)
+                if post:
+                    update_stats(Post.author.get_value_for_datastore(post),
+                                 comments=-1)
+            run_xg(txn)
+            page_cache.invalidate()
             self.redirect('/blog/')
         else:
             self.redirect('/blog')
@@ -502,6 +753,19 @@ class MainPage(Handler):
 
         self.write("You've been here %s times" % visits)
 
+
+class Migrate(Handler):
+    """ Handler that starts the data migrations, app.yaml limits it to
+    admins. Each runs as deferred batches and is safe to start again """
+    def get(self):
+        deferred.defer(map_all, Post, migrate_liked_by)
+        deferred.defer(map_all, Post, backfill_created)
+        deferred.defer(map_all, User, claim_usernames,
+                       done=finish_claim_usernames)
+        deferred.defer(map_all, User, backfill_stats)
+        self.response.headers['Content-Type'] = 'text/plain'
+        self.write("Migrations started")
+
 app = webapp2.WSGIApplication([('/', MainPage),
                               ('/blog/?', BlogFront),
                               ('/blog/([0-9]+)', PostPage),
@@ -514,5 +778,6 @@ app = webapp2.WSGIApplication([('/', MainPage),
                               ('/blog/deletecomment/([0-9]+)', DeleteComment),
                               ('/blog/deletepost/([0-9]+)', DeletePost),
                               ('/blog/updatepost/([0-9]+)', UpdatePost),
-                              ('/blog/likepost/([0-9]+)', LikePost)],
+                              ('/blog/likepost/([0-9]+)', LikePost),
+                              ('/admin/migrate', Migrate)],
                               debug=True)
@@ -0,0 +1,73 @@
+""" Batch
+
+Author: Aron Roberts
+Version: 1.02
+Date Created: 10/18/2026
+filename: batch.py
+
+Last Update:
+Date: 10/18/2026
+DESC: batched keys only deletes, resumed on the task queue,
+      put_batch, map_all for deferred migrations,
+      map_all calls done after its last batch
+
+"""
+from google.appengine.ext import db
+from google.appengine.ext import deferred
+
+# keys deleted per db.delete call, 500 is the datastore limit
+BATCH_SIZE = 500
+
+
+def put_batch(*entities):
+    """ puts the entities that are not None with one datastore call,
+    returns an rpc, get_result() waits for the write """
+    return db.put_async([e for e in entities if e is not None])
+
+
+def delete_all(model, filters=(), hook=None, cursor=None):
+    """ deletes every entity of model matching filters
+
+    filters is a list of (property operator, value) pairs as passed to
+    Query.filter. The first batch of BATCH_SIZE keys is deleted right
+    away, if there are more the rest is deleted by a deferred task that
+    starts from the cursor and defers the next one, so a failed task is
+    retried from where it stopped. hook, a module level function, is
+    called with each batch of keys before it is deleted.
+
+    usage: delete_all(Comment, [('post =', post.key())])
+    """
+    query = model.all(keys_only=True)
+    for (prop_op, value) in filters:
+        query.filter(prop_op, value)
+    if cursor:
+        query.with_cursor(cursor)
+    keys = query.fetch(BATCH_SIZE)
+    if hook:
+        hook(keys)
+    db.delete(keys)
+    if len(keys) == BATCH_SIZE:
+        deferred.defer(delete_all, model, filters, hook, query.cursor())
+
+
+def map_all(model, func, batch_size=100, cursor=None, done=None):
+    """ calls func with every entity of model, batch_size at a time
+
+    Each batch runs in its own deferred task, which defers the next one
+    from its cursor, so a failed batch is retried from where it stopped.
+    func, a module level function, is called with a list of entities and
+    must be safe to run twice on the same ones. done, a module level
+    function, is called without arguments after the last batch.
+
+    usage: deferred.defer(map_all, Post, migrate_liked_by)
+    """
+    query = model.all()
+    if cursor:
+        query.with_cursor(cursor)
+    entities = query.fetch(batch_size)
+    func(entities)
+    if len(entities) == batch_size:
+        deferred.defer(map_all, model, func, batch_size, query.cursor(),
+                       done)
+    elif done:
+        done()
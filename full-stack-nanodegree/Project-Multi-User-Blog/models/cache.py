@@ -0,0 +1,164 @@
+""" Cache
+
+Author: Aron Roberts
+Version: 1.02
+Date Created: 10/18/2026
+filename: cache.py
+
+Last Update:
+Date: 10/18/2026
+DESC: in process LRU cache backed by memcache,
+      generation invalidated page cache,
+      negative results kept in memcache only,
+      page generation read before the query, short ttl right after writes,
+      separate in process ttl for TwoTierCache
+
+"""
+import collections
+import threading
+import time
+
+from google.appengine.api import memcache
+from google.appengine.datastore import entity_pb
+from google.appengine.ext import db
+
+
+def entity_to_pb(entity):
+    """ serialize entity for memcache """
+    return db.model_to_protobuf(entity).Encode()
+
+
+def pb_to_entity(data):
+    """ rebuild an entity serialized by entity_to_pb """
+    return db.model_from_protobuf(entity_pb.EntityProto(data))
+
+
+class LRUCache(object):
+    """ thread safe in process cache, least recently used entries are
+    dropped past max_size and entries expire ttl seconds after set """
+
+    def __init__(self, max_size=1000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                return None
+            # re-insert as most recently used
+            self._items[key] = item
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (value, time.time() + self.ttl)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class TwoTierCache(object):
+    """ read-through cache, checks process memory then memcache
+
+    namespace keeps keys of different caches apart in memcache, dumps and
+    loads convert values to and from what is stored in memcache. Other
+    instances may serve a deleted entry from their process memory until
+    its ttl runs out, keep ttl short for data that changes.
+
+    negative is the value cached for "not found". It is kept in memcache
+    only, so a delete on one instance reaches all of them at once.
+
+    local_ttl, ttl by default, limits how long process memory keeps an
+    entry, so a short local_ttl bounds how stale other instances can be
+    while memcache keeps entries for ttl.
+    """
+
+    def __init__(self, namespace, max_size=1000, ttl=60,
+                 dumps=None, loads=None, negative=None, local_ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative = negative
+        self.local = LRUCache(max_size, local_ttl or ttl)
+        self.dumps = dumps or (lambda value: value)
+        self.loads = loads or (lambda value: value)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            data = memcache.get(key, namespace=self.namespace)
+            if data is not None:
+                value = self.loads(data)
+                if value != self.negative:
+                    self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        if value == self.negative:
+            self.local.delete(key)
+        else:
+            self.local.set(key, value)
+        memcache.set(key, self.dumps(value), time=self.ttl,
+                     namespace=self.namespace)
+
+    def delete(self, key):
+        self.local.delete(key)
+        memcache.delete(key, namespace=self.namespace)
+
+
+class PageCache(object):
+    """ whole responses in memcache, all dropped at once by invalidate()
+
+    keys are prefixed with a generation counter, bumping it orphans every
+    cached page which then expires after ttl seconds. Read the generation
+    with generation() before querying and pass it to get and set, so a
+    page rendered while a write bumps it is stored under the old one.
+
+    Datastore queries may not see a write for a moment after it, pages
+    stored within settle seconds of the last invalidate() may be missing
+    it and are only kept for settle seconds.
+    """
+
+    def __init__(self, namespace, ttl=600, settle=10):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.settle = settle
+
+    def generation(self):
+        gen = memcache.get('generation', namespace=self.namespace)
+        if gen is None:
+            # start from the clock so an evicted counter is not reused
+            memcache.add('generation', int(time.time()),
+                         namespace=self.namespace)
+            gen = memcache.get('generation', namespace=self.namespace)
+        return gen
+
+    def get(self, key, gen):
+        return memcache.get('%s:%s' % (gen, key), namespace=self.namespace)
+
+    def set(self, key, value, gen):
+        ttl = self.ttl
+        written = memcache.get('invalidated', namespace=self.namespace)
+        if written is not None and time.time() - written < self.settle:
+            ttl = self.settle
+        memcache.set('%s:%s' % (gen, key), value, time=ttl,
+                     namespace=self.namespace)
+
+    def invalidate(self):
+        memcache.set('invalidated', time.time(), time=self.settle,
+                     namespace=self.namespace)
+        memcache.incr('generation', namespace=self.namespace,
+                      initial_value=int(time.time()))
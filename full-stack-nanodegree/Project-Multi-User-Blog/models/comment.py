@@ -1,16 +1,19 @@
 """ Comment
 
 Author: Aron Roberts
-Version: 1.01
+Version: 1.03
 Date Created: 3/4/2017
 filename: comment.py
 
 Last Update:
-Date: 3/5/2017
-DESC: altered code to meet pep8
+Date: 10/18/2026
+DESC: created date for listing comments in order,
+      backfill_created dates legacy comments and counts them
 
 """
+from google.appengine.api import datastore
 from google.appengine.ext import db
+from models import batch
 from models.user import User
 from models.post import Post
 
@@ -22,3 +25,36 @@ class Comment(db.Model):
     author = db.ReferenceProperty(User, required=True,
                                   collection_name='comments')
     comment = db.TextProperty(required=True)
+    created = db.DateTimeProperty(auto_now_add=True)
+
+
+def backfill_created(posts):
+    """ sets created on the comments of posts that predate it and the
+    comment_count of posts that predate it, run by map_all from
+    main.Migrate
+
+    Old comments get the post's created date, so they list before the
+    newer ones. They are read as raw entities, a Comment model fills a
+    missing created with the current time. The post is then marked
+    comments_dated, which lets PostPage order its comments by created.
+    """
+    for post in posts:
+        if post.comments_dated:
+            continue
+        comments = list(datastore.Query('Comment',
+                                        {'post =': post.key()}).Run())
+        undated = [e for e in comments if 'created' not in e]
+        for e in undated:
+            e['created'] = post.created
+        for i in range(0, len(undated), batch.BATCH_SIZE):
+            datastore.Put(undated[i:i + batch.BATCH_SIZE])
+
+        def txn(post_key=post.key(), count=len(comments)):
+            fresh_post = Post.get(post_key)
+            if fresh_post is None:
+                return
+            if fresh_post.comment_count is None:
+                fresh_post.comment_count = count
+            fresh_post.comments_dated = True
+            fresh_post.put()
+        db.run_in_transaction(txn)
@@ -0,0 +1,103 @@
+""" Counter
+
+Author: Aron Roberts
+Version: 1.02
+Date Created: 10/18/2026
+filename: counter.py
+
+Last Update:
+Date: 10/18/2026
+DESC: sharded counters with the total cached in memcache,
+      shard_key and add_to_shard for batched writes,
+      get_counts reads many counters in one batch
+
+"""
+import random
+
+from google.appengine.api import memcache
+from google.appengine.ext import db
+
+# writes to one counter are spread over this many entity groups
+NUM_SHARDS = 20
+# cached totals are recounted at least this often (seconds)
+CACHE_TTL = 60
+
+
+class CounterShard(db.Model):
+    """ Entity class for one shard of a counter,
+    key_name is '<counter name>:<shard index>' """
+    count = db.IntegerProperty(default=0)
+
+
+def _shard_keys(name):
+    return [db.Key.from_path('CounterShard', '%s:%d' % (name, i))
+            for i in range(NUM_SHARDS)]
+
+
+def get_count(name):
+    """ returns the total of counter name """
+    total = memcache.get(name, namespace='counter')
+    if total is None:
+        total = sum(s.count for s in db.get(_shard_keys(name)) if s)
+        memcache.add(name, total, time=CACHE_TTL, namespace='counter')
+    return total
+
+
+def get_counts(names):
+    """ returns a dict of the totals of counters names, read with one
+    memcache call and one datastore get for the totals not cached """
+    totals = memcache.get_multi(names, namespace='counter')
+    missing = [name for name in names if name not in totals]
+    if missing:
+        shards = db.get([key for name in missing
+                         for key in _shard_keys(name)])
+        for i, name in enumerate(missing):
+            totals[name] = sum(s.count for s in
+                               shards[i * NUM_SHARDS:(i + 1) * NUM_SHARDS]
+                               if s)
+        memcache.add_multi(dict((name, totals[name]) for name in missing),
+                           time=CACHE_TTL, namespace='counter')
+    return totals
+
+
+def shard_key(name):
+    """ returns the key of a random shard of counter name """
+    return db.Key.from_path('CounterShard', '%s:%d' % (
+        name, random.randint(0, NUM_SHARDS - 1)))
+
+
+def add_to_shard(shard, key, delta=1):
+    """ adds delta to shard, a new shard with key when shard is None
+
+    returns the shard for the caller to put, so it can be written in one
+    batch with other entities
+    """
+    if shard is None:
+        shard = CounterShard(key=key)
+    shard.count += delta
+    return shard
+
+
+def increment(name, delta=1):
+    """ adds delta to a random shard of counter name
+
+    joins the caller's transaction if there is one, the shard is a root
+    entity so that transaction has to be cross group (xg). Call
+    update_cached() once the write is committed.
+    """
+    key = shard_key(name)
+    add_to_shard(db.get(key), key, delta).put()
+
+
+def update_cached(name, delta=1):
+    """ applies a committed increment to the cached total, if cached """
+    if delta >= 0:
+        memcache.incr(name, delta, namespace='counter')
+    else:
+        memcache.decr(name, -delta, namespace='counter')
+
+
+def delete(name):
+    """ removes counter name """
+    db.delete(_shard_keys(name))
+    memcache.delete(name, namespace='counter')
@@ -0,0 +1,198 @@
+""" Hashers
+
+Author: Aron Roberts
+Version: 1.01
+Date Created: 10/18/2026
+filename: hashers.py
+
+Last Update:
+Date: 10/18/2026
+DESC: pluggable password hashing with tunable work factors,
+      legacy hashes recognised by their shape, their salts may hold '$'
+
+stored hashes are '<algorithm>$<parameters>$<salt>$<hash>', for example
+pbkdf2_sha256$20000$<salt>$<hash>. Hashes from before this module are
+'<hash>,<salt>' and are checked by LegacyHasher.
+
+"""
+import binascii
+import hashlib
+import hmac
+import os
+import re
+
+SECRET = "Arma virumque cano, Troiae qui primus ab oris Italiam, fato profugus"
+
+# work factors for new hashes, raise them as the hardware allows.
+# run password_benchmark.py to see the logins per second they cost
+PBKDF2_ITERATIONS = 20000
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# '<64 hex digit hmac>,<salt>', old salts are any printable characters
+LEGACY_RE = re.compile(r'^[0-9a-f]{64},', re.DOTALL)
+
+
+def make_salt():
+    """ returns a random hex salt """
+    return binascii.hexlify(os.urandom(16)).decode('ascii')
+
+
+def constant_time_compare(a, b):
+    """ compares a and b in time independent of where they differ """
+    if not isinstance(a, bytes):
+        a = a.encode('utf-8')
+    if not isinstance(b, bytes):
+        b = b.encode('utf-8')
+    if hasattr(hmac, 'compare_digest'):
+        return hmac.compare_digest(a, b)
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(bytearray(a), bytearray(b)):
+        result |= x ^ y
+    return result == 0
+
+
+def _pbkdf2_sha256(password, salt, iterations):
+    """ PBKDF2-HMAC-SHA256, in pure python before python 2.7.8 """
+    if hasattr(hashlib, 'pbkdf2_hmac'):
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+    mac = hmac.new(password, None, hashlib.sha256)
+
+    def prf(data):
+        h = mac.copy()
+        h.update(data)
+        return h.digest()
+
+    # one block is enough, the derived key is the size of a sha256 digest
+    u = prf(salt + '\x00\x00\x00\x01')
+    result = bytearray(u)
+    for _ in range(iterations - 1):
+        u = prf(u)
+        for i, c in enumerate(bytearray(u)):
+            result[i] ^= c
+    return str(result)
+
+
+class Hasher(object):
+    """ base class of the password hashers """
+    algorithm = None
+
+    def encode(self, username, password, salt):
+        """ returns the stored form of password """
+        raise NotImplementedError
+
+    def parse(self, encoded):
+        """ returns a hasher with the parameters of encoded and its salt """
+        raise NotImplementedError
+
+    def params(self):
+        return ()
+
+    def verify(self, username, password, encoded):
+        """ returns True when password matches the stored hash """
+        hasher, salt = self.parse(encoded)
+        return constant_time_compare(
+            hasher.encode(username, password, salt), encoded)
+
+    def needs_rehash(self, encoded):
+        """ returns True when encoded was made with other parameters """
+        return self.parse(encoded)[0].params() != self.params()
+
+
+class PBKDF2Hasher(Hasher):
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def encode(self, username, password, salt):
+        h = _pbkdf2_sha256(password.encode('utf-8'), salt.encode('ascii'),
+                           self.iterations)
+        return '%s$%d$%s$%s' % (self.algorithm, self.iterations, salt,
+                                binascii.hexlify(h).decode('ascii'))
+
+    def parse(self, encoded):
+        algorithm, iterations, salt, h = encoded.split('$')
+        return PBKDF2Hasher(int(iterations)), salt
+
+    def params(self):
+        return (self.iterations,)
+
+
+class ScryptHasher(Hasher):
+    """ needs hashlib.scrypt, python 3.6+ built with OpenSSL 1.1 """
+    algorithm = 'scrypt'
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+        self.n, self.r, self.p = n, r, p
+
+    def encode(self, username, password, salt):
+        h = hashlib.scrypt(password.encode('utf-8'),
+                           salt=salt.encode('ascii'),
+                           n=self.n, r=self.r, p=self.p,
+                           maxmem=256 * self.n * self.r, dklen=32)
+        return '%s$%d$%d$%d$%s$%s' % (self.algorithm, self.n, self.r, self.p,
+                                      salt,
+                                      binascii.hexlify(h).decode('ascii'))
+
+    def parse(self, encoded):
+        algorithm, n, r, p, salt, h = encoded.split('$')
+        return ScryptHasher(int(n), int(r), int(p)), salt
+
+    def params(self):
+        return (self.n, self.r, self.p)
+
+
+class LegacyHasher(Hasher):
+    """ HMAC-SHA256 of username and password keyed by salt and SECRET,
+    only checked, new hashes always use PREFERRED """
+    algorithm = 'legacy'
+
+    def encode(self, username, password, salt):
+        key = bytearray(salt + SECRET, 'utf-8')
+        msg = bytearray(username + password, 'utf-8')
+        h = hmac.new(key, msg, hashlib.sha256).hexdigest()
+        return "%s,%s" % (h, salt)
+
+    def parse(self, encoded):
+        return self, encoded.split(',', 1)[1]
+
+    def needs_rehash(self, encoded):
+        return True
+
+
+HASHERS = dict((h.algorithm, h) for h in
+               [PBKDF2Hasher(), ScryptHasher(), LegacyHasher()])
+# algorithm used for new hashes and rehashes
+PREFERRED = 'pbkdf2_sha256'
+
+
+def identify(encoded):
+    """ returns the hasher that made encoded """
+    if LEGACY_RE.match(encoded):
+        return HASHERS['legacy']
+    return HASHERS[encoded.split('$', 1)[0]]
+
+
+def make_password(username, password, algorithm=PREFERRED):
+    """ returns the stored form of password """
+    return HASHERS[algorithm].encode(username, password, make_salt())
+
+
+def check_password(username, password, encoded):
+    """ returns True when password matches encoded """
+    try:
+        return identify(encoded).verify(username, password, encoded)
+    except (KeyError, IndexError, ValueError, AttributeError, TypeError):
+        # unknown algorithm, malformed hash or no scrypt in this python
+        return False
+
+
+def needs_rehash(encoded, algorithm=PREFERRED):
+    """ returns True when encoded should be replaced on the next login """
+    hasher = identify(encoded)
+    return (hasher.algorithm != algorithm or
+            hasher.needs_rehash(encoded))
@@ -0,0 +1,96 @@
+""" Like
+
+Author: Aron Roberts
+Version: 1.05
+Date Created: 10/18/2026
+filename: like.py
+
+Last Update:
+Date: 10/18/2026
+DESC: likes as their own entities, totals in a sharded counter,
+      count likes in the author's UserStats, batched like deletes,
+      one read and one write call per like,
+      migrate_liked_by moves legacy liked_by lists to Like entities,
+      author's like total in a sharded counter instead of UserStats
+
+"""
+from google.appengine.ext import db
+from models import counter
+from models.batch import delete_all, put_batch
+from models.user import User
+from models.post import Post
+from models.stats import like_counter, run_xg
+
+
+class Like(db.Model):
+    """ Entity class for like, key_name is '<post id>:<user id>' so a
+    user can like a post only once """
+    post = db.ReferenceProperty(Post, required=True,
+                                collection_name='like_set')
+    user = db.ReferenceProperty(User, required=True,
+                                collection_name='likes')
+    created = db.DateTimeProperty(auto_now_add=True)
+
+
+def add_like(post, user):
+    """ records that user likes post, returns False if they already did """
+    if str(user.key().id()) in post.liked_by:
+        return False
+    key_name = '%d:%d' % (post.key().id(), user.key().id())
+    like_key = db.Key.from_path('Like', key_name)
+    shard_key = counter.shard_key(post.like_counter)
+    author_counter = like_counter(Post.author.get_value_for_datastore(post))
+    author_shard_key = counter.shard_key(author_counter)
+
+    def txn():
+        like, shard, author_shard = db.get(
+            [like_key, shard_key, author_shard_key])
+        if like:
+            return False
+        put_batch(Like(key=like_key, post=post, user=user),
+                  counter.add_to_shard(shard, shard_key),
+                  counter.add_to_shard(author_shard,
+                                       author_shard_key)).get_result()
+        return True
+
+    added = run_xg(txn)
+    if added:
+        counter.update_cached(post.like_counter)
+        counter.update_cached(author_counter)
+    return added
+
+
+def delete_likes(post):
+    """ removes the likes of post and its counter """
+    delete_all(Like, [('post =', post.key())])
+    counter.delete(post.like_counter)
+
+
+def migrate_liked_by(posts):
+    """ moves the likes in liked_by of posts to Like entities and the
+    like counter, run by map_all from main.Migrate
+
+    The Like entities are put first, they are keyed so putting them again
+    is harmless. liked_by is then emptied and its length added to a shard
+    in one transaction, so Post.likes stays the same throughout.
+    """
+    for post in posts:
+        if not post.liked_by:
+            continue
+        db.put([Like(key_name='%d:%s' % (post.key().id(), uid),
+                     post=post,
+                     user=db.Key.from_path('User', int(uid)))
+                for uid in post.liked_by])
+        shard_key = counter.shard_key(post.like_counter)
+
+        def txn(post_key=post.key(), shard_key=shard_key):
+            fresh_post, shard = db.get([post_key, shard_key])
+            if not fresh_post or not fresh_post.liked_by:
+                return 0
+            moved = len(fresh_post.liked_by)
+            fresh_post.liked_by = []
+            shard = counter.add_to_shard(shard, shard_key, moved)
+            put_batch(fresh_post, shard).get_result()
+            return moved
+
+        counter.update_cached(post.like_counter, run_xg(txn))
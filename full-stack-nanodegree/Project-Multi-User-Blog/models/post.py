@@ -1,25 +1,31 @@
 """ Post
 
 Author: Aron Roberts
-Version: 1.01
+Version: 1.09
 Date Created: 3/4/2017
 filename: post.py
 
 Last Update:
-Date: 3/5/2017
-DESC: set author_name and likes as @property
+Date: 10/18/2026
+DESC: cache rendered post html by post version,
+      likes read from a sharded counter, shared jinja environment,
+      denormalized comment_count, add_to_comment_count for batched writes,
+      count likes still in liked_by until they are migrated,
+      comments_dated once every comment has a created date,
+      prefetch_counts reads the counts of a page of posts in one batch,
+      post.html gets is_author instead of comparing usernames
 
 """
 
-import jinja2
-import os
-
+from google.appengine.api import memcache
 from google.appengine.ext import db
+from models import counter
+from models.cache import TwoTierCache
 from models.user import User
+from templating import jinja_env
 
-template_dir = os.path.join(os.path.dirname(__file__), '../templates')
-jinja_env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir),
-                               autoescape=True)
+# rendered post.html fragments, keyed by post version and viewer
+render_cache = TwoTierCache('post_html', max_size=500, ttl=3600)
 
 
 class Post(db.Model):
@@ -28,28 +34,130 @@ class Post(db.Model):
     subject = db.StringProperty(required=True)
     content = db.TextProperty(required=True)
     created = db.DateTimeProperty(auto_now_add=True)
-    last_modified = db.DateTimeProperty(auto_now=True)
+    # set by UpdatePost, comment_count updates do not modify the post
+    last_modified = db.DateTimeProperty(auto_now_add=True)
+    # None on posts from before it was kept, see num_comments
+    comment_count = db.IntegerProperty()
+    # False while some comments may lack created, set on new posts and
+    # by comment.backfill_created
+    comments_dated = db.BooleanProperty(default=False)
+    # ids of users who liked the post before Like entities were used,
+    # emptied by like.migrate_liked_by
     liked_by = db.ListProperty(str)
     # implicit property comments
+    # implicit property like_set
+
+    # counts set by prefetch_counts, read by likes and num_comments
+    _likes = None
+    _num_comments = None
 
     def render_str(self, template, **params):
         """ renders HTML template into str """
         t = jinja_env.get_template(template)
         return t.render(params)
 
-    def render(self, **params):
-        """ render text for more practical html """
-        self._render_text = self.content.replace('\n', '<br>')
-        return self.render_str("post.html", p=self, **params)
+    def render(self, user=None, **params):
+        """ render text for more practical html, the html only depends on
+        the post version and whether user is the author so it is cached """
+        is_author = self.viewer_is_author(user)
+        key = self.render_key(is_author)
+        html = render_cache.get(key)
+        if html is None:
+            self._render_text = self.content.replace('\n', '<br>')
+            html = self.render_str("post.html", p=self, user=user,
+                                   is_author=is_author, **params)
+            render_cache.set(key, html)
+        return html
+
+    def viewer_is_author(self, user):
+        """ compares keys so the author entity is not fetched """
+        return bool(user and
+                    user.key() == Post.author.get_value_for_datastore(self))
+
+    def render_key(self, is_author):
+        return '%d:%s:%d:%d:%d' % (self.key().id(),
+                                   self.last_modified.isoformat(),
+                                   self.likes, self.num_comments, is_author)
+
+    def uncache_render(self):
+        """ drops the cached html of the current version of the post,
+        call before changing the post """
+        for is_author in (False, True):
+            render_cache.delete(self.render_key(is_author))
 
     @property
     def author_name(self):
         if self.author:
             return ('%s %s' % (self.author.first_name, self.author.last_name))
 
+    @property
+    def like_counter(self):
+        """ name of the sharded counter of likes """
+        return 'post_likes:%d' % self.key().id()
+
     @property
     def likes(self):
-        if self.liked_by:
-            return len(self.liked_by)
-        else:
-            return 0
+        if self._likes is not None:
+            return self._likes
+        return counter.get_count(self.like_counter) + len(self.liked_by)
+
+    @property
+    def num_comments(self):
+        if self.comment_count is not None:
+            return self.comment_count
+        if self._num_comments is not None:
+            return self._num_comments
+        return self.comments.count()
+
+
+def prefetch_counts(posts):
+    """ reads the like and comment counts of posts in one batch, so
+    rendering a page of posts does not look them up post by post
+
+    Comment counts of posts from before comment_count are counted once
+    and kept in memcache, adding or deleting a comment sets comment_count
+    so the cached count is never read again.
+
+    usage: prefetch_counts(posts)
+    """
+    likes = counter.get_counts([p.like_counter for p in posts])
+    for p in posts:
+        p._likes = likes[p.like_counter] + len(p.liked_by)
+    legacy = dict((str(p.key().id()), p) for p in posts
+                  if p.comment_count is None)
+    if legacy:
+        counts = memcache.get_multi(legacy.keys(), namespace='comment_count')
+        for post_id, p in legacy.items():
+            if post_id not in counts:
+                counts[post_id] = p.comments.count()
+                memcache.set(post_id, counts[post_id],
+                             namespace='comment_count')
+            p._num_comments = counts[post_id]
+    return posts
+
+
+def add_to_comment_count(post, delta, legacy_count):
+    """ adds delta to the comment_count of post and returns it for the
+    caller to put, a deleted post (None) is returned as None
+
+    legacy_count, num_comments read before the transaction, starts the
+    count of posts from before comment_count.
+    """
+    if post is not None:
+        count = post.comment_count
+        if count is None:
+            count = legacy_count
+        post.comment_count = count + delta
+    return post
+
+
+def update_comment_count(post_key, delta, legacy_count):
+    """ adds delta to the comment_count of the post with post_key
+
+    joins the caller's transaction. Returns the post, None if it was
+    deleted.
+    """
+    post = add_to_comment_count(Post.get(post_key), delta, legacy_count)
+    if post is not None:
+        post.put()
+    return post
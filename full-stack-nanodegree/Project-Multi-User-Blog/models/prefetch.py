@@ -0,0 +1,37 @@
+""" Prefetch
+
+Author: Aron Roberts
+Version: 1.01
+Date Created: 10/18/2026
+filename: prefetch.py
+
+Last Update:
+Date: 10/18/2026
+DESC: batch resolve ReferenceProperty values,
+      entities of several models in one batch
+
+"""
+from google.appengine.ext import db
+
+
+def prefetch_refprops(entities, *props):
+    """ resolves the reference properties props on every entity
+
+    collects the referenced keys of all entities, fetches them with one
+    batch db.get and attaches the results, so reading entity.author in a
+    template no longer costs a datastore get per entity. entities may be
+    of several models, each prop is resolved on the entities of its model
+
+    usage: prefetch_refprops(posts, Post.author)
+           prefetch_refprops([post] + comments, Post.author, Comment.author)
+    """
+    fields = [(entity, prop) for entity in entities for prop in props
+              if isinstance(entity, prop.model_class)]
+    ref_keys = [prop.get_value_for_datastore(entity)
+                for (entity, prop) in fields]
+    keys = list(set(key for key in ref_keys if key))
+    ref_entities = dict((e.key(), e) for e in db.get(keys) if e)
+    for (entity, prop), key in zip(fields, ref_keys):
+        if key in ref_entities:
+            prop.__set__(entity, ref_entities[key])
+    return entities
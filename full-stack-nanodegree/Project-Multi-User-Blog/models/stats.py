@@ -0,0 +1,102 @@
+""" Stats
+
+Author: Aron Roberts
+Version: 1.02
+Date Created: 10/18/2026
+filename: stats.py
+
+Last Update:
+Date: 10/18/2026
+DESC: per user totals for the dashboard,
+      stats_key and add_to_stats for batched writes,
+      likes received kept in a sharded counter per user,
+      backfill_stats counts older users, counts read in one batch
+
+"""
+from google.appengine.ext import db
+from models import counter
+from models.post import prefetch_counts
+
+
+def like_counter(user_key):
+    """ name of the sharded counter of likes the user's posts received """
+    return 'user_likes:%d' % user_key.id()
+
+
+class UserStats(db.Model):
+    """ Entity class for the totals of a user, key_name is the user id
+
+    likes and comments count what the user's posts received. New likes
+    go to the user's like_counter, so likes only holds what the counter
+    misses: likes from before the stats and those of deleted posts.
+    total_likes is the sum of both.
+    """
+    likes = db.IntegerProperty(default=0)
+    posts = db.IntegerProperty(default=0)
+    comments = db.IntegerProperty(default=0)
+
+    @classmethod
+    def for_user(cls, user):
+        """ returns the stats of user, counted from their posts without
+        being saved while backfill_stats has not reached them """
+        stats = cls.get_by_key_name(str(user.key().id()))
+        if stats is None:
+            stats = count_stats(user)
+        stats.total_likes = stats.likes + counter.get_count(
+            like_counter(user.key()))
+        return stats
+
+
+def count_stats(user):
+    """ returns an unsaved UserStats of user counted from their posts, one
+    query for the posts and one batch for their counts """
+    posts = prefetch_counts(list(user.posts))
+    counted = counter.get_count(like_counter(user.key()))
+    return UserStats(key_name=str(user.key().id()),
+                     likes=sum(p.likes for p in posts) - counted,
+                     posts=len(posts),
+                     comments=sum(p.num_comments for p in posts))
+
+
+def backfill_stats(users):
+    """ creates the UserStats of users from before they were kept, run by
+    map_all from main.Migrate. New users get theirs at signup """
+    existing = db.get([stats_key(u.key()) for u in users])
+    for (u, stats) in zip(users, existing):
+        if stats is None:
+            counted = count_stats(u)
+            UserStats.get_or_insert(str(u.key().id()), likes=counted.likes,
+                                    posts=counted.posts,
+                                    comments=counted.comments)
+
+
+def stats_key(user_key):
+    """ returns the key of the UserStats of the user with key user_key """
+    return db.Key.from_path('UserStats', str(user_key.id()))
+
+
+def add_to_stats(stats, likes=0, posts=0, comments=0):
+    """ adds to the totals of stats and returns it for the caller to put,
+    stats of None (user not backfilled yet) is returned as None """
+    if stats is not None:
+        stats.likes += likes
+        stats.posts += posts
+        stats.comments += comments
+    return stats
+
+
+def update_stats(user_key, likes=0, posts=0, comments=0):
+    """ adds to the totals of the user with key user_key
+
+    joins the caller's transaction, which must be cross group (xg).
+    Users without stats yet are skipped, backfill_stats counts them.
+    """
+    stats = add_to_stats(db.get(stats_key(user_key)), likes, posts, comments)
+    if stats is not None:
+        stats.put()
+
+
+def run_xg(func, *args, **kw):
+    """ runs func in a cross group transaction """
+    options = db.create_transaction_options(xg=True)
+    return db.run_in_transaction_options(options, func, *args, **kw)
@@ -1,24 +1,46 @@
 """ User
 
 Author: Aron Roberts
-Version: 1.00
+Version: 1.05
 Date Created: 3/4/2017
 filename: user.py
 
 Last Update:
-Date: 3/5/2017
-DESC:PEP8 Edits
+Date: 10/18/2026
+DESC: cache users by id in memory and memcache,
+      uncache_users for batched deletes,
+      look users up by username through Username entities,
+      passwords hashed by models.hashers, rehashed on login,
+      claim_usernames backfill replaces the username query,
+      untaken usernames cached in memcache only,
+      by_username falls back to a query until claim_usernames has
+      reached every user,
+      claim_usernames logs names taken by another user
 
 """
 
-import hashlib
-import hmac
-import random
-import string
+import logging
 
+from google.appengine.api import memcache
 from google.appengine.ext import db
+from models import hashers
+from models.cache import TwoTierCache, entity_to_pb, pb_to_entity
 
-SECRET = "Arma virumque cano, Troiae qui primus ab oris Italiam, fato profugus"
+# users by id, read on every authenticated request. Deletes and edits
+# only reach other instances' memory when their copy expires
+user_cache = TwoTierCache('user', max_size=1000, ttl=300, local_ttl=30,
+                          dumps=entity_to_pb, loads=pb_to_entity)
+# set once claim_usernames has reached every user, see usernames_claimed
+_usernames_claimed = False
+# username -> user id, 0 for usernames that are not taken. 0 stays out of
+# process memory, Username.claim has to reach every instance
+username_cache = TwoTierCache('username', max_size=1000, ttl=60, negative=0)
+
+
+def uncache_users(keys):
+    """ drops the cached copies of the users with keys """
+    for key in keys:
+        user_cache.delete(str(key.id()))
 
 
 class User(db.Model):
@@ -33,42 +55,133 @@ class User(db.Model):
 
     @classmethod
     def by_id(cls, uid):
-        return cls.get_by_id(uid)
-
-    @classmethod
-    def by_username(cls, username):
-        u = cls.all().filter('username =', username).get()
+        """ returns user with id uid, served from user_cache when cached """
+        u = user_cache.get(str(uid))
+        if u is None:
+            u = cls.get_by_id(uid)
+            if u:
+                user_cache.set(str(uid), u)
         return u
 
+    def put(self, **kw):
+        """ saves user and drops the cached copy """
+        key = db.Model.put(self, **kw)
+        user_cache.delete(str(key.id()))
+        return key
+
+    def delete(self, **kw):
+        """ deletes user, its Username and the cached copies """
+        user_cache.delete(str(self.key().id()))
+        username_cache.delete(self.username)
+        entry = Username.get_by_key_name(self.username)
+        if entry and (Username.user.get_value_for_datastore(entry) ==
+                      self.key()):
+            entry.delete()
+        db.Model.delete(self, **kw)
+
     @classmethod
-    def make_salt(cls, n=5):
-        """ returns generated salt """
-        return ''.join(random.SystemRandom().choice(string.printable) for _ in range(n))
+    def by_username(cls, username):
+        """ returns the user with username through its Username entity
+
+        users from before Username was kept have none until
+        claim_usernames reaches them, until it has reached all of them a
+        miss is looked up by query, so their name is neither free for
+        signup nor closed to login in the meantime """
+        uid = username_cache.get(username)
+        if uid is None:
+            entry = Username.get_by_key_name(username)
+            uid = 0
+            if entry:
+                uid = Username.user.get_value_for_datastore(entry).id()
+            elif not usernames_claimed():
+                legacy = cls.all(keys_only=True).filter(
+                    'username =', username).get()
+                if legacy:
+                    uid = legacy.id()
+            username_cache.set(username, uid)
+        return uid and cls.by_id(uid) or None
 
     @classmethod
-    def make_pw_hash(cls, name, pw, salt=""):
+    def make_pw_hash(cls, name, pw):
         """ Make a storable hash of the password """
-        # check if salt param set
-        if not salt:
-            salt = cls.make_salt()
-
-        # convert key and msg from unicdoe str to byte str
-        key = bytearray(salt+SECRET, 'utf-8')
-        msg = bytearray(name+pw, 'utf-8')
-
-        # create hash
-        h = hmac.new(key, msg, hashlib.sha256).hexdigest()
-        return "%s,%s" % (h, salt)
+        return hashers.make_password(name, pw)
 
     @classmethod
     def valid_pw(cls, username, pw, h):
-        salt = h.split(',')[1]
-        if h == cls.make_pw_hash(username, pw, salt):
-            return True
+        return hashers.check_password(username, pw, h)
 
     @classmethod
     def login(cls, username, pw):
         u = cls.by_username(username)
-        # if u and valid_pw(username, pw, u.password):
         if u and cls.valid_pw(username, pw, u.password):
+            # move the hash to the current algorithm and work factor
+            if hashers.needs_rehash(u.password):
+                u.password = cls.make_pw_hash(username, pw)
+                u.put()
             return u
+
+
+class Username(db.Model):
+    """ Entity class for a taken username, key_name is the username so
+    looking a user up by name is a get instead of a query """
+    user = db.ReferenceProperty(User, required=True,
+                                collection_name='username_set')
+
+    @classmethod
+    def claim(cls, username, user):
+        """ links username to user, returns False if it is taken """
+        def txn():
+            entry = cls.get_by_key_name(username)
+            if entry:
+                # claim_usernames may have got to a new user first
+                return (cls.user.get_value_for_datastore(entry) ==
+                        user.key())
+            cls(key_name=username, user=user).put()
+            return True
+
+        claimed = db.run_in_transaction(txn)
+        if claimed:
+            username_cache.delete(username)
+        return claimed
+
+
+def claim_usernames(users):
+    """ creates the Username entities of users from before they were kept,
+    run by map_all from main.Migrate. Names already claimed by another
+    user are logged and left alone, returns the users that lost theirs """
+    lost = []
+    for u in users:
+        entry = Username.get_or_insert(u.username, user=u)
+        if Username.user.get_value_for_datastore(entry) != u.key():
+            logging.warning("username %r of user %d is taken by user %d",
+                            u.username, u.key().id(),
+                            Username.user.get_value_for_datastore(entry).id())
+            lost.append(u)
+        username_cache.delete(u.username)
+    return lost
+
+
+class Migration(db.Model):
+    """ Entity class for a finished data migration, key_name is its name """
+    finished = db.DateTimeProperty(auto_now_add=True)
+
+
+def usernames_claimed():
+    """ True once claim_usernames has reached every user, kept in process
+    once true and in memcache for a minute while false """
+    global _usernames_claimed
+    if not _usernames_claimed:
+        done = memcache.get('claim_usernames', namespace='migration')
+        if done is None:
+            done = Migration.get_by_key_name('claim_usernames') is not None
+            memcache.set('claim_usernames', done, time=60,
+                         namespace='migration')
+        _usernames_claimed = done
+    return _usernames_claimed
+
+
+def finish_claim_usernames():
+    """ records that claim_usernames has reached every user, passed to
+    map_all as done. Users signing up since have claimed their own """
+    Migration.get_or_insert('claim_usernames')
+    memcache.set('claim_usernames', True, namespace='migration')
@@ -0,0 +1,56 @@
+""" Password Benchmark
+
+Author: Aron Roberts
+Version: 1.00
+Date Created: 10/18/2026
+filename: password_benchmark.py
+
+Last Update:
+Date: 10/18/2026
+DESC: logins per second per core for each hasher setting
+
+usage: python password_benchmark.py [seconds per setting]
+
+runs without the App Engine SDK. Each setting checks one password
+repeatedly in a single thread, which is what a login costs one core.
+scrypt is skipped on pythons without hashlib.scrypt.
+
+"""
+import hashlib
+import sys
+import time
+
+from models import hashers
+
+SETTINGS = ([('legacy', hashers.LegacyHasher())] +
+            [('pbkdf2_sha256 %d' % i, hashers.PBKDF2Hasher(i))
+             for i in (10000, 20000, 50000, 100000, 200000)])
+if hasattr(hashlib, 'scrypt'):
+    SETTINGS += [('scrypt n=%d r=8 p=1' % n, hashers.ScryptHasher(n, 8, 1))
+                 for n in (2 ** 12, 2 ** 14, 2 ** 15)]
+
+
+def logins_per_second(hasher, seconds):
+    """ returns how many checks of one password hasher does a second """
+    encoded = hasher.encode(u'alice', u'correct horse', hashers.make_salt())
+    checks = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        hasher.verify(u'alice', u'correct horse', encoded)
+        checks += 1
+    return checks / (time.time() - start)
+
+
+def main(seconds=1.0):
+    print('%-28s %14s %10s' % ('setting', 'logins/s/core', 'ms/login'))
+    for name, hasher in SETTINGS:
+        rate = logins_per_second(hasher, seconds)
+        marker = ''
+        if (hasher.algorithm == hashers.PREFERRED and
+                hasher.params() == hashers.HASHERS[hashers.PREFERRED].params()):
+            marker = '  (current)'
+        print('%-28s %14.1f %10.2f%s' % (name, rate, 1000.0 / rate, marker))
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,51 @@
+""" Templating
+
+Author: Aron Roberts
+Version: 1.00
+Date Created: 10/18/2026
+filename: templating.py
+
+Last Update:
+Date: 10/18/2026
+DESC: one jinja environment for the handlers and models
+
+run compile_templates.py before deploying to precompile templates/
+into templates_compiled/, production instances then import the
+compiled templates instead of parsing them on a cold start.
+
+"""
+import os
+
+import jinja2
+
+from google.appengine.api import memcache
+
+template_dir = os.path.join(os.path.dirname(__file__), 'templates')
+compiled_dir = os.path.join(os.path.dirname(__file__), 'templates_compiled')
+
+# dev_appserver reports 'Development/...', production 'Google App Engine/...'
+DEBUG = not os.environ.get('SERVER_SOFTWARE', '').startswith('Google')
+
+
+def make_env(debug=DEBUG):
+    """ returns the environment for debug or production
+
+    production uses the precompiled templates when they exist, otherwise
+    it parses templates/ once and keeps the bytecode in memcache for the
+    other instances. Template files are only checked for changes in debug.
+    """
+    if not debug and os.path.isdir(compiled_dir):
+        loader = jinja2.ModuleLoader(compiled_dir)
+        bytecode_cache = None
+    else:
+        loader = jinja2.FileSystemLoader(template_dir)
+        bytecode_cache = jinja2.MemcachedBytecodeCache(
+            memcache, prefix='jinja2/bytecode/%s/' %
+            os.environ.get('CURRENT_VERSION_ID', ''))
+    return jinja2.Environment(loader=loader,
+                              bytecode_cache=bytecode_cache,
+                              auto_reload=debug,
+                              autoescape=True)
+
+
+jinja_env = make_env()
@@ -1,19 +1,37 @@
+# PostgreSQL 16 from the PostgreSQL apt repository (PGDG), tournament.sql
+# needs 11 or later and the distro packages lag behind
 apt-get -qqy update
-apt-get -qqy install postgresql python-psycopg2
-apt-get -qqy install python-flask python-sqlalchemy
-apt-get -qqy install python-pip
-pip install bleach
-pip install oauth2client
-pip install requests
-pip install httplib2
-pip install redis
-pip install passlib
-pip install itsdangerous
-pip install flask-httpauth
+apt-get -qqy install curl ca-certificates lsb-release
+install -d /usr/share/postgresql-common/pgdg
+curl -fsSL -o /usr/share/postgresql-common/pgdg/apt.postgresql.org.asc \
+  https://www.postgresql.org/media/keys/ACCC4CF8.asc
+echo "deb [signed-by=/usr/share/postgresql-common/pgdg/apt.postgresql.org.asc] https://apt.postgresql.org/pub/repos/apt $(lsb_release -cs)-pgdg main" \
+  > /etc/apt/sources.list.d/pgdg.list
+apt-get -qqy update
+apt-get -qqy install postgresql-16 libpq-dev
+
+# the projects run on python 2.7, jammy has no python 2 pip package
+apt-get -qqy install python2 python2-dev build-essential
+curl -fsSL https://bootstrap.pypa.io/pip/2.7/get-pip.py | python2
+# execute_values needs psycopg2 2.7, 2.8 is the last release for python 2
+python2 -m pip install 'psycopg2>=2.7,<2.9'
+python2 -m pip install flask sqlalchemy
+python2 -m pip install bleach
+python2 -m pip install oauth2client
+python2 -m pip install requests
+python2 -m pip install httplib2
+python2 -m pip install redis
+python2 -m pip install passlib
+python2 -m pip install itsdangerous
+python2 -m pip install flask-httpauth
+# tournament_async.py runs on python 3, it shares tournament.py's
+# constants and name cleaning and its test checks against tournament.py
+apt-get -qqy install python3-pip python3-dev
+python3 -m pip install asyncpg psycopg2 bleach
 su postgres -c 'createuser -dRS vagrant'
 su vagrant -c 'createdb'
-su vagrant -c 'createdb tournament'
-su vagrant -c 'psql tournament -f /vagrant/tournament/tournament.sql'
+# tournament.sql drops and creates the tournament database itself
+su vagrant -c 'psql -f /vagrant/tournament/tournament.sql'
 
 vagrantTip="[35m[1mThe shared directory is located at /vagrant\nTo access your shared files: cd /vagrant(B[m"
 echo -e $vagrantTip > /etc/motd
@@ -0,0 +1,286 @@
+""" Swiss Pairing Engine
+    UDACITY Full stack Developer Project 2
+    Pure python pairing for a swiss tournament round, no database access
+    Author: Aron Roberts
+    Version: 1.01
+    Date: 10/18/2026
+    filename: swiss.py
+
+    Players are ranked by wins and paired from the top down with the
+    nearest player they have not played yet. When a player is left with
+    nobody they have not played, only the players around them are
+    re-paired by a backtracking search, widening the window until it
+    succeeds, or they are swapped into the nearest pair that allows it,
+    so a large field costs about one pass. If no rematch free
+    pairing is found, a greedy pass pairs each player with the nearest one
+    they have not played and swaps pairs to remove the rematches it can.
+    With an odd field the BYE goes to the lowest ranked player who has
+    not had one.
+"""
+
+
+# candidate checks the backtracking searches of one round may make
+MAX_STEPS = 200000
+# players above a conflict re-paired by its first local search
+WINDOW = 16
+# widest window searched before a is swapped into a pair instead
+MAX_WINDOW = 256
+# pairs on each side of a rematch the greedy fallback tries to swap with
+SWAP_RANGE = 32
+# number of BYE candidates tried before falling back
+MAX_BYE_CANDIDATES = 3
+
+
+def _pairIndexes(ids, played, max_steps=MAX_STEPS):
+    """Pairs ids in order without repeating any pair in played.
+
+    Returns a tuple (pairs, steps): a list of (i, j) index pairs, or None
+    when no rematch free pairing was found within max_steps candidate
+    checks, and the number of checks made.
+    """
+    n = len(ids)
+    partner = [None] * n
+    stack = []
+    a = 0
+    first = 1
+    steps = 0
+    while True:
+        while a < n and partner[a] is not None:
+            a += 1
+        if a == n:
+            return stack, steps
+
+        # nearest unpaired player below a that a has not played
+        found = None
+        j = max(first, a + 1)
+        while j < n:
+            steps += 1
+            if partner[j] is None and (ids[a], ids[j]) not in played:
+                found = j
+                break
+            j += 1
+        if steps > max_steps:
+            return None, steps
+
+        if found is None:
+            # undo the last pairing and try its next candidate
+            if not stack:
+                return None, steps
+            a, j = stack.pop()
+            partner[a] = partner[j] = None
+            first = j + 1
+            continue
+
+        partner[a] = found
+        partner[found] = a
+        stack.append((a, found))
+        a += 1
+        first = a + 1
+
+
+def _find(nxt, i):
+    """Returns the first unpaired index from i on, len(nxt) - 1 if none.
+
+    nxt[i] is i for an unpaired index and points further down for a
+    paired one, paths are shortened as they are followed.
+    """
+    root = i
+    while nxt[root] != root:
+        root = nxt[root]
+    while nxt[i] != root:
+        nxt[i], i = root, nxt[i]
+    return root
+
+
+def _swap(ids, played, partner, nxt, a):
+    """Pairs a with the nearest paired player x above them they have not
+    played, if x's partner can take one of the unpaired players below a.
+
+    Returns True when a is paired.
+    """
+    n = len(ids)
+    below = []
+    j = _find(nxt, a + 1)
+    while j < n:
+        below.append(j)
+        j = _find(nxt, j + 1)
+    for x in range(a - 1, -1, -1):
+        if (ids[a], ids[x]) in played:
+            continue
+        y = partner[x]
+        for r in below:
+            if (ids[y], ids[r]) not in played:
+                partner[a], partner[x] = x, a
+                partner[y], partner[r] = r, y
+                nxt[a] = a + 1
+                nxt[r] = r + 1
+                return True
+    return False
+
+
+def _repair(ids, played, partner, nxt, a, budget):
+    """Re-pairs the players around a, who has nobody left to play.
+
+    The pairs whose upper player is at most w places above a are undone
+    and, with the unpaired players down to w places below a, paired again
+    by _pairIndexes. w starts at WINDOW and doubles until the search
+    succeeds, the window covers the whole field or grows past MAX_WINDOW.
+    After that a is swapped into the nearest pair that allows it. budget
+    is a one item list with the candidate checks left for the round.
+
+    Returns True when a is paired.
+    """
+    n = len(ids)
+    w = WINDOW
+    while w <= MAX_WINDOW and budget[0] > 0:
+        lo = max(0, a - w)
+        hi = min(n - 1, a + w)
+        window = set()
+        for i in range(lo, hi + 1):
+            if partner[i] is None:
+                window.add(i)
+            elif min(i, partner[i]) >= lo:
+                window.add(i)
+                window.add(partner[i])
+        if len(window) % 2:
+            extra = _find(nxt, hi + 1)
+            if extra < n:
+                window.add(extra)
+        window = sorted(window)
+        pairs, steps = _pairIndexes([ids[i] for i in window], played,
+                                    budget[0])
+        budget[0] -= steps
+        if pairs is not None:
+            for (i, j) in pairs:
+                partner[window[i]] = window[j]
+                partner[window[j]] = window[i]
+            for i in window:
+                nxt[i] = i + 1
+            return True
+        if lo == 0 and hi == n - 1:
+            break
+        w *= 2
+    return _swap(ids, played, partner, nxt, a)
+
+
+def _localIndexes(ids, played, max_steps=MAX_STEPS):
+    """Pairs ids in order without repeating any pair in played.
+
+    Each player is paired with the first unpaired player below them they
+    have not played. A player left with none has the players around them
+    re-paired by _repair. Returns a list of (i, j) index pairs, or None
+    when no rematch free pairing was found within max_steps candidate
+    checks.
+    """
+    n = len(ids)
+    partner = [None] * n
+    nxt = list(range(n + 1))
+    budget = [max_steps]
+    a = _find(nxt, 0)
+    while a < n:
+        j = _find(nxt, a + 1)
+        while j < n and (ids[a], ids[j]) in played:
+            j = _find(nxt, j + 1)
+        if j < n:
+            partner[a] = j
+            partner[j] = a
+            nxt[a] = a + 1
+            nxt[j] = j + 1
+        elif not _repair(ids, played, partner, nxt, a, budget):
+            return None
+        a = _find(nxt, a)
+    return [(i, partner[i]) for i in range(n) if partner[i] > i]
+
+
+def _greedyIndexes(ids, played):
+    """Pairs ids in order, keeping rematches few without a full search.
+
+    Each player is paired with the nearest unpaired player below them they
+    have not played, or the nearest one at all when everyone left is a
+    rematch. Each remaining rematch is then swapped with a pair at most
+    SWAP_RANGE pairs away whenever re-pairing the four players gives fewer
+    rematches. Returns a list of (i, j) index pairs.
+    """
+    n = len(ids)
+    nxt = list(range(n + 1))
+    pairs = []
+    a = _find(nxt, 0)
+    while a < n:
+        first = j = _find(nxt, a + 1)
+        if first == n:
+            break
+        while j < n and (ids[a], ids[j]) in played:
+            j = _find(nxt, j + 1)
+        if j == n:
+            j = first
+        nxt[a] = a + 1
+        nxt[j] = j + 1
+        pairs.append((a, j))
+        a = _find(nxt, a)
+
+    def rematches(pair_list):
+        return sum(1 for (i, j) in pair_list if (ids[i], ids[j]) in played)
+
+    for x in range(len(pairs)):
+        if rematches([pairs[x]]) == 0:
+            continue
+        for y in range(max(0, x - SWAP_RANGE),
+                       min(len(pairs), x + SWAP_RANGE + 1)):
+            if y == x:
+                continue
+            (a, b), (c, d) = pairs[x], pairs[y]
+            before = rematches([(a, b), (c, d)])
+            for swap in (((a, c), (b, d)), ((a, d), (b, c))):
+                if rematches(swap) < before:
+                    pairs[x], pairs[y] = [tuple(sorted(p)) for p in swap]
+                    break
+            if rematches([pairs[x]]) == 0:
+                break
+    return sorted(pairs)
+
+
+def pairPlayers(standings, history=(), byes=()):
+    """Returns the pairings for the next round.
+
+    Args:
+      standings: a list of (id, name, wins) tuples, best player first
+      history: an iterable of (id1, id2) pairs that have already played
+      byes: an iterable of the ids of players who have had a BYE
+
+    Returns:
+      A list of tuples, each of which contains (id1, name1, id2, name2).
+      With an odd number of players the first tuple is the BYE,
+      (id, name, 0, 'BYE').
+    """
+    # stable sort keeps the given tie breaks inside each score group
+    players = sorted(standings, key=lambda row: -row[2])
+    played = set()
+    for (p1, p2) in history:
+        played.add((p1, p2))
+        played.add((p2, p1))
+    byes = set(byes)
+
+    bye_candidates = [None]
+    if len(players) % 2 != 0:
+        # lowest ranked first, players who already had a BYE last
+        ranked = range(len(players) - 1, -1, -1)
+        bye_candidates = ([i for i in ranked if players[i][0] not in byes] +
+                          [i for i in ranked if players[i][0] in byes])
+
+    for bye in bye_candidates[:MAX_BYE_CANDIDATES]:
+        field = [p for (i, p) in enumerate(players) if i != bye]
+        pairs = _localIndexes([p[0] for p in field], played)
+        if pairs is not None:
+            break
+    else:
+        # no rematch free round was found, settle for as few as we can
+        bye = bye_candidates[0]
+        field = [p for (i, p) in enumerate(players) if i != bye]
+        pairs = _greedyIndexes([p[0] for p in field], played)
+
+    pairings = []
+    if bye is not None:
+        pairings.append((players[bye][0], players[bye][1], 0, 'BYE'))
+    for (i, j) in pairs:
+        pairings.append((field[i][0], field[i][1], field[j][0], field[j][1]))
+    return pairings
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#
+# Test cases for swiss.py, runs without a database
+
+import time
+
+from swiss import pairPlayers
+
+
+def testNoRematch():
+    standings = [(i, "Player %d" % i, 0) for i in range(1, 9)]
+    history = [(1, 2), (3, 4), (5, 6), (7, 8)]
+    played = set(history) | set((q, p) for (p, q) in history)
+    pairings = pairPlayers(standings, history)
+    if [p for p in pairings if (p[0], p[2]) in played]:
+        raise ValueError("pairPlayers() should avoid rematches.")
+    print("1. Players are not paired with someone they have played.")
+
+
+def testBye():
+    standings = [(i, "Player %d" % i, 0) for i in range(1, 6)]
+    pairings = pairPlayers(standings, byes=[5])
+    if pairings[0][2] != 0 or pairings[0][0] == 5:
+        raise ValueError(
+            "The BYE should go to the lowest player without one.")
+    print("2. The BYE goes to the lowest ranked player without one.")
+
+
+def testLargeFieldConflict():
+    n = 10000
+    standings = [(i, "Player %d" % i, 0) for i in range(1, n + 1)]
+    # the bottom player has already played the 12 players above them
+    history = [(n, n - k) for k in range(1, 13)]
+    played = set(history) | set((q, p) for (p, q) in history)
+    start = time.time()
+    pairings = pairPlayers(standings, history)
+    elapsed = time.time() - start
+    if elapsed > 1.0:
+        raise ValueError(
+            "Pairing 10,000 players took %.1fs, over a second." % elapsed)
+    paired = [i for p in pairings for i in (p[0], p[2])]
+    if len(set(paired)) != n:
+        raise ValueError("Every player should be paired exactly once.")
+    if [p for p in pairings if (p[0], p[2]) in played]:
+        raise ValueError("pairPlayers() should avoid rematches.")
+    print("3. 10,000 players with a conflict at the bottom pair in a second.")
+
+
+if __name__ == '__main__':
+    testNoRematch()
+    testBye()
+    testLargeFieldConflict()
+    print("Success!  All tests pass!")
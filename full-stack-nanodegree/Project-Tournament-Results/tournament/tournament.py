@@ -3,23 +3,50 @@
     This file contains functions that use DB-API calls
     to manage a swiss tournament database
     Author: Aron Roberts
-    Version: 1.03
+    Version: 1.11
     Date: 1/16/2016
     filename: tournament.py
 
-    Last Update: 1/19/2016
-    added cursor creation into connect()
+    Last Update: 10/18/2026
+    added pooled connections, connection() context manager
+    added registerPlayers() bulk registration
+    added reportMatches() batch reporting, byes stored with a NULL loser
+    added rebuildStandings(), standings are now kept in the Standings table
+    swissPairings() pairs through swiss.py, avoiding rematches and repeat BYEs
+    added multiple tournaments, every function takes a tournament_id
+    added an in-process standings cache checked against standings_version
+    pool waits for a free connection, checkout retries until one is healthy
 
     notes: line 86 is considered long by PEP8 but is a SQL execute
 """
 
 
 import psycopg2
+import psycopg2.extras
+import psycopg2.pool
+import threading
 import time
 import bleach
 
+from contextlib import contextmanager
+from swiss import pairPlayers
 
-def connect(database_name="tournament"):
+
+DATABASE_NAME = "tournament"
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 10
+BATCH_SIZE = 1000
+DEFAULT_TOURNAMENT = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+# tournament_id -> (standings_version, standings rows)
+_standings_cache = {}
+
+
+def connect(database_name=DATABASE_NAME):
     """Connect to the PostgreSQL database.  Returns a database connection."""
     try:
         db = psycopg2.connect("dbname = {}".format(database_name))
@@ -29,32 +56,266 @@ def connect(database_name="tournament"):
         print("Databse Connection Failed")
 
 
-def deleteMatches():
-    """Remove all the match records from the database."""
-    db, c = connect()
-    c.execute("DELETE FROM Matches --")
-    db.commit()
-    db.close()
+class _BlockingPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that makes callers wait for a free connection.
+
+    ThreadedConnectionPool raises PoolError once maxconn connections are
+    checked out, here getconn() blocks until one is returned instead.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        psycopg2.pool.ThreadedConnectionPool.__init__(
+            self, minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return psycopg2.pool.ThreadedConnectionPool.getconn(self, key)
+        except:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            psycopg2.pool.ThreadedConnectionPool.putconn(self, conn, key,
+                                                         close)
+        finally:
+            self._slots.release()
+
+
+def initPool(minconn=POOL_MIN_CONN, maxconn=POOL_MAX_CONN,
+             database_name=DATABASE_NAME):
+    """Creates (or replaces) the module connection pool.
+
+    Called implicitly with the module defaults the first time a connection
+    is borrowed, call it explicitly to change the pool size or database.
+    Once maxconn connections are borrowed, further callers wait until one
+    is returned. Replacing a pool that still has connections lent out
+    raises PoolError, call it before the pool is shared between threads.
+
+    Args:
+      minconn: connections opened up front and kept open
+      maxconn: upper bound on connections open at once
+      database_name: database every pooled connection points at
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            if _pool._used:
+                raise psycopg2.pool.PoolError("connection pool is in use")
+            _pool.closeall()
+        _pool = _BlockingPool(
+            minconn, maxconn, "dbname = {}".format(database_name))
+    return _pool
+
+
+def closePool():
+    """Closes every connection held by the module connection pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def _getPool():
+    """Returns the module connection pool, creating it on first use.
+
+    The pool is checked again under _pool_lock so that threads making
+    their first call at the same time share one pool.
+    """
+    global _pool
+    pool = _pool
+    if pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _BlockingPool(POOL_MIN_CONN, POOL_MAX_CONN,
+                                      "dbname = {}".format(DATABASE_NAME))
+            pool = _pool
+    return pool
+
+
+def _checkout(pool):
+    """Borrows a healthy connection from pool.
+
+    Connections are checked with a trivial query before they are handed
+    out. A connection that fails the check (server restart, idle timeout)
+    is discarded and the next one is checked, until the idle connections
+    are used up and the pool opens a fresh one. Raises the last error if
+    no connection passes within maxconn + 1 tries.
+    """
+    for attempt in range(pool.maxconn + 1):
+        db = pool.getconn()
+        try:
+            if db.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            c = db.cursor()
+            c.execute("SELECT 1")
+            db.rollback()
+            return db
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            pool.putconn(db, close=True)
+            error = e
+    raise error
+
+
+def _rollback(db):
+    """Rolls back db, returns False if the connection is unusable."""
+    if db.closed:
+        return False
+    try:
+        db.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+@contextmanager
+def connection():
+    """Borrows a pooled connection for the duration of a with block.
+
+    Yields a (db, cursor) pair like connect(). The work done inside the
+    block is committed when it exits cleanly and rolled back if it raises.
+    Module functions called inside the block reuse the borrowed connection,
+    so several operations can share one connection and one transaction:
+
+        with connection() as (db, c):
+            registerPlayer("Twilight Sparkle")
+            registerPlayer("Fluttershy")
+    """
+    borrowed = getattr(_local, 'db', None)
+    if borrowed is not None:
+        # nested use, the outermost block owns commit and release
+        yield borrowed, borrowed.cursor()
+        return
+
+    pool = _getPool()
+    db = _checkout(pool)
+    _local.db = db
+    broken = False
+    try:
+        yield db, db.cursor()
+        db.commit()
+    except:
+        # deadlocks and timeouts leave a usable connection, only one the
+        # rollback cannot reach is discarded
+        broken = not _rollback(db)
+        raise
+    finally:
+        _local.db = None
+        pool.putconn(db, close=broken or bool(db.closed))
+
+
+def _partition(tournament_id):
+    """Returns the name of the Matches partition of a tournament."""
+    return "matches_%d" % int(tournament_id)
+
+
+def _invalidateStandings(tournament_id=None):
+    """Drops the cached standings of a tournament, or of all of them."""
+    if tournament_id is None:
+        _standings_cache.clear()
+    else:
+        _standings_cache.pop(tournament_id, None)
+
+
+def _standings(c, tournament_id):
+    """Returns the standings rows (id, name, wins, matches) of a tournament.
+
+    Rows are cached per tournament together with the tournament's
+    standings_version. Every change to the standings (in this process or
+    any other) gives the tournament a new version, so a cached copy is
+    used only while the version in the database still matches it.
+    """
+    c.execute("SELECT standings_version FROM Tournaments "
+              "WHERE tournament_id = %s", (tournament_id,))
+    row = c.fetchone()
+    version = row and row[0]
+    cached = _standings_cache.get(tournament_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    c.execute("SELECT player_id, full_name, wins, matches "
+              "FROM Player_Standings WHERE tournament_id = %s",
+              (tournament_id,))
+    players = [(row[0], row[1], int(row[2]), int(row[3]))
+               for row in c.fetchall()]
+    _standings_cache[tournament_id] = (version, players)
+    return players
+
+
+def _cleanName(name):
+    """Returns name with any HTML markup stripped.
+
+    Names without '<', '>' or '&' have no markup for bleach to strip or
+    escape, so they skip bleach.clean(), which is by far the slowest part
+    of registering a big field.
+    """
+    if '<' in name or '>' in name or '&' in name:
+        name = bleach.clean(name, strip=True)
+    return str(name)
+
+
+def createTournament(name):
+    """Adds a tournament and its Matches partition.
+
+    Args:
+      name: the tournament's name
+
+    Returns:
+      The new tournament's id.
+    """
+    name = _cleanName(name)
+    with connection() as (db, c):
+        c.execute("SELECT create_tournament(%s)", (name,))
+        tournament_id = c.fetchone()[0]
+    return tournament_id
+
+
+def deleteTournament(tournament_id):
+    """Removes a tournament with all its players and matches.
+
+    Dropping the partition briefly locks the whole Matches table, use
+    deleteMatches() and deletePlayers() to reset a running tournament.
+    """
+    with connection() as (db, c):
+        c.execute("DROP TABLE IF EXISTS %s" % _partition(tournament_id))
+        c.execute("DELETE FROM Tournaments WHERE tournament_id = %s",
+                  (tournament_id,))
+    _invalidateStandings(tournament_id)
+
+
+def deleteMatches(tournament_id=DEFAULT_TOURNAMENT):
+    """Remove all the match records of a tournament from the database.
+
+    Only the tournament's own Matches partition is truncated, other
+    tournaments are neither touched nor locked.
+    """
+    with connection() as (db, c):
+        c.execute("TRUNCATE %s" % _partition(tournament_id))
+        c.execute("SELECT rebuild_standings(%s)", (tournament_id,))
+    _invalidateStandings(tournament_id)
 
 
-def deletePlayers():
-    """Remove all the player records from the database."""
-    db, c = connect()
-    c.execute("DELETE FROM Players --")
-    db.commit()
-    db.close()
+def deletePlayers(tournament_id=DEFAULT_TOURNAMENT):
+    """Remove all the player records of a tournament from the database."""
+    with connection() as (db, c):
+        c.execute("TRUNCATE %s" % _partition(tournament_id))
+        c.execute("DELETE FROM Players WHERE tournament_id = %s",
+                  (tournament_id,))
+    _invalidateStandings(tournament_id)
 
 
-def countPlayers():
+def countPlayers(tournament_id=DEFAULT_TOURNAMENT):
     """Returns the number of players currently registered."""
-    db, c = connect()
-    c.execute("SELECT count(player_id) FROM players")
-    count = c.fetchone()[0]
-    db.close()
+    with connection() as (db, c):
+        c.execute("SELECT count(player_id) FROM players "
+                  "WHERE tournament_id = %s", (tournament_id,))
+        count = c.fetchone()[0]
     return count
 
 
-def registerPlayer(name):
+def registerPlayer(name, tournament_id=DEFAULT_TOURNAMENT):
     """Adds a player to the tournament database.
 
     The database assigns a unique serial id number for the player.  (This
@@ -62,15 +323,46 @@ def registerPlayer(name):
 
     Args:
       name: the player's full name (need not be unique).
+      tournament_id: the tournament the player is registered for
+    """
+    name = _cleanName(name)
+    with connection() as (db, c):
+        c.execute("INSERT INTO players (tournament_id, full_name) "
+                  "VALUES(%s, %s)", (tournament_id, name,))
+    _invalidateStandings(tournament_id)
+
+
+def registerPlayers(names, tournament_id=DEFAULT_TOURNAMENT):
+    """Adds many players to the tournament database in one transaction.
+
+    Player ids are reserved from the players sequence up front and the rows
+    are written with multi-row INSERTs of BATCH_SIZE players each, so large
+    fields cost a couple of round trips instead of one per player.
+
+    Args:
+      names: an iterable of the players' full names
+      tournament_id: the tournament the players are registered for
+
+    Returns:
+      A list of the assigned player ids, in the same order as names.
     """
-    db, c = connect()
-    name = str(bleach.clean(name, strip=True))
-    c.execute("INSERT INTO players (full_name) VALUES(%s)", (name,))
-    db.commit()
-    db.close()
+    names = [_cleanName(name) for name in names]
+    if not names:
+        return []
+    with connection() as (db, c):
+        c.execute("SELECT nextval(pg_get_serial_sequence('players', "
+                  "'player_id')) FROM generate_series(1, %s)", (len(names),))
+        ids = [row[0] for row in c.fetchall()]
+        psycopg2.extras.execute_values(
+            c, "INSERT INTO players (player_id, tournament_id, full_name) "
+            "VALUES %s", [(i, tournament_id, name)
+                          for (i, name) in zip(ids, names)],
+            page_size=BATCH_SIZE)
+    _invalidateStandings(tournament_id)
+    return ids
 
 
-def playerStandings():
+def playerStandings(tournament_id=DEFAULT_TOURNAMENT):
     """Returns a list of the players and their win records, sorted by wins.
 
     The first entry in the list is the player in first place,or a player
@@ -83,41 +375,83 @@ def playerStandings():
         wins: the number of matches the player has won
         matches: the number of matches the player has played
     """
-    db, c = connect()
-    c.execute("SELECT player_id, full_name, wins, matches FROM Player_Standings")
-    players = [(row[0], row[1], int(row[2]), int(row[3]))
-               for row in c.fetchall()]
-    db.close()
-    return players
+    with connection() as (db, c):
+        players = _standings(c, tournament_id)
+    return list(players)
+
+
+def rebuildStandings(tournament_id=None):
+    """Recomputes the Standings table from the match history.
+
+    Standings are normally kept up to date by triggers as matches are
+    recorded, this is only needed to recover from a bad import or a
+    manual edit of the Matches table.
+
+    Args:
+      tournament_id: the tournament to rebuild, None rebuilds them all
+    """
+    with connection() as (db, c):
+        c.execute("SELECT rebuild_standings(%s)", (tournament_id,))
+    _invalidateStandings(tournament_id)
 
 
-def reportMatch(winner, loser):
+def reportMatch(winner, loser, tournament_id=DEFAULT_TOURNAMENT):
     """Records the outcome of a single match between two players.
     Verifies that both players are registered
 
     Args:
       winner:  the id number of the player who won
-      loser:  the id number of the player who lost
-    """
-    winner = int(bleach.clean(winner, strip=True))
-    loser = int(bleach.clean(loser, strip=True))
-    db, c = connect()
-    c.execute("SELECT player_id FROM players")
-    players = [row[0] for row in c.fetchall()]
-    if ((winner in players) and ((loser in players) or (loser == 0))):
-        c.execute("INSERT INTO matches (winner, loser) VALUES(%s, %s)",
-                  (int(winner), int(loser),))
-        db.commit()
-    db.close()
+      loser:  the id number of the player who lost, 0 for a BYE
+      tournament_id: the tournament the match was played in
+    """
+    reportMatches([(winner, loser)], tournament_id)
+
+
+def reportMatches(pairs, tournament_id=DEFAULT_TOURNAMENT):
+    """Records the outcomes of a whole round of matches at once.
+
+    All player ids are verified with a single primary key lookup and the
+    matches are written with one multi-row INSERT in one transaction.
+    Pairs naming a player not registered for the tournament, or a player
+    against themselves, are skipped just like reportMatch() skips them.
+
+    Args:
+      pairs: an iterable of (winner, loser) id tuples, loser 0 for a BYE
+      tournament_id: the tournament the matches were played in
+
+    Returns:
+      The number of matches recorded.
+    """
+    pairs = [(int(winner), int(loser)) for (winner, loser) in pairs]
+    if not pairs:
+        return 0
+    ids = list(set([p for pair in pairs for p in pair if p != 0]))
+    with connection() as (db, c):
+        c.execute("SELECT player_id FROM players "
+                  "WHERE tournament_id = %s AND player_id = ANY(%s)",
+                  (tournament_id, ids))
+        players = set([row[0] for row in c.fetchall()])
+        # a BYE is stored as a match with no loser
+        matches = [(tournament_id, winner, loser or None)
+                   for (winner, loser) in pairs
+                   if winner in players and winner != loser and
+                   (loser in players or loser == 0)]
+        if matches:
+            psycopg2.extras.execute_values(
+                c, "INSERT INTO matches (tournament_id, winner, loser) "
+                "VALUES %s",
+                matches, page_size=BATCH_SIZE)
+    _invalidateStandings(tournament_id)
+    return len(matches)
 
 
-def swissPairings():
+def swissPairings(tournament_id=DEFAULT_TOURNAMENT):
     """Returns a list of pairs of players for the next round of a match.
 
-    Assuming that there are an even number of players registered, each player
-    appears exactly once in the pairings.  Each player is paired with another
-    player with an equal or nearly-equal win record, that is, a player adjacent
-    to him or her in the standings. If odd pairing, player in last recieved BYE
+    Each player appears exactly once in the pairings.  Each player is paired
+    with the nearest player in the standings with an equal or nearly-equal
+    win record that they have not played yet. If odd pairing, the lowest
+    ranked player who has not had one recieves the BYE (see swiss.py).
 
     Returns:
       A list of tuples, each of which contains (id1, name1, id2, name2)
@@ -126,22 +460,13 @@ def swissPairings():
         id2: the second player's unique id
         name2: the second player's name
     """
-    db, c = connect()
-    c.execute("SELECT player_id, full_name FROM Player_Standings")
-    players = [(row[0], row[1])
-               for row in c.fetchall()]
-    pairs = []
-    participants = len(players)
-    if (participants % 2 != 0):
-        participants = participants - 1
-        pairs.append((players[participants][0], players[participants][1],
-                      0, 'BYE'))
-
-    i = 0
-    while (i < participants):
-        pairs.append((players[i][0], players[i][1],
-                      players[i+1][0], players[i+1][1]))
-        i = i + 2
-
-    db.close()
-    return pairs
+    with connection() as (db, c):
+        players = [(i, name, wins)
+                   for (i, name, wins, matches) in _standings(c, tournament_id)]
+        c.execute("SELECT winner, loser FROM Matches "
+                  "WHERE tournament_id = %s", (tournament_id,))
+        matches = c.fetchall()
+    history = [(winner, loser) for (winner, loser) in matches
+               if loser is not None]
+    byes = [winner for (winner, loser) in matches if loser is None]
+    return pairPlayers(players, history, byes)
@@ -1,13 +1,19 @@
 -- Database Schema for the tournament project.
 -- Author: Aron Roberts
--- Version: 1.02
+-- Version: 1.08
 -- Date Created: 12/30/2015
 -- filename: tournament.sql
 --
--- Last Update: 1/19/2016
--- added more comments
--- included code to create database
--- added some constraints
+-- Last Update: 10/18/2026
+-- replaced the stacked win/loss views with a Standings table
+-- kept up to date by triggers, added rebuild_standings()
+-- added indexes for the match lookups and the standings order
+-- added Tournaments, Matches is partitioned by tournament
+-- requires PostgreSQL 11 or later
+-- added Tournaments.standings_version for standings caches
+-- match indexes lead with tournament_id, faster standings_add_match
+-- standings_add_match locks the tournament row, concurrent reports no
+-- longer lose opponent wins
 
 -- DROP DATABASE 
 DROP DATABASE IF EXISTS tournament;
@@ -21,52 +27,229 @@ DROP VIEW IF EXISTS Player_Standings;
 DROP VIEW IF EXISTS Opponent_Wins;
 DROP VIEW IF EXISTS Player_Losses;
 DROP VIEW IF EXISTS Player_Wins;
+DROP TABLE IF EXISTS Standings;
 DROP TABLE IF EXISTS Matches;
 DROP TABLE IF EXISTS Players;
+DROP TABLE IF EXISTS Tournaments;
+DROP SEQUENCE IF EXISTS standings_version_seq;
 
 -- CREATE TABLES
+-- Tournaments
+-- standings_version changes whenever the tournament's standings change,
+-- clients caching standings compare it to their copy. It is drawn from a
+-- sequence so a rolled back change never reuses a version number.
+CREATE SEQUENCE standings_version_seq;
+
+CREATE TABLE Tournaments
+(
+	tournament_id SERIAL,
+	name VARCHAR(255) NOT NULL,
+	standings_version bigint NOT NULL DEFAULT nextval('standings_version_seq'),
+	PRIMARY KEY (tournament_id)
+);
+
 -- Players
+-- players are registered to one tournament
 CREATE TABLE Players
 ( 
 	player_id SERIAL,
+	tournament_id int NOT NULL,
 	full_name VARCHAR(255) NOT NULL,
-	PRIMARY KEY(player_id)
+	PRIMARY KEY(player_id),
+	UNIQUE (tournament_id, player_id),
+	FOREIGN KEY (tournament_id) REFERENCES Tournaments(tournament_id)
+		ON DELETE CASCADE
 );
 
 -- Matches
+-- partitioned by tournament, create_tournament() adds the partition.
+-- The foreign keys include tournament_id so both players must belong to
+-- the tournament and cascades only touch that tournament's partition.
 CREATE TABLE Matches
 (
+	tournament_id int NOT NULL,
 	match_id SERIAL,
 	winner int,
 	loser int,
-	PRIMARY KEY (match_id),
-	FOREIGN KEY (winner) REFERENCES Players(player_id) ON DELETE CASCADE,
-	FOREIGN KEY (loser) REFERENCES Players(player_id) ON DELETE CASCADE,
+	PRIMARY KEY (tournament_id, match_id),
+	FOREIGN KEY (tournament_id, winner)
+		REFERENCES Players(tournament_id, player_id) ON DELETE CASCADE,
+	FOREIGN KEY (tournament_id, loser)
+		REFERENCES Players(tournament_id, player_id) ON DELETE CASCADE,
 	CHECK (winner <> loser)
+) PARTITION BY LIST (tournament_id);
+
+-- each index also carries the other player so the standings lookups
+-- and rebuild can be answered from the index alone. tournament_id leads
+-- so the queries (and the foreign key cascades) that name it use one index
+CREATE INDEX matches_winner_idx ON Matches (tournament_id, winner, loser);
+CREATE INDEX matches_loser_idx ON Matches (tournament_id, loser, winner);
+
+
+-- Standings
+-- one row per player, maintained by the triggers below so reading the
+-- standings never has to aggregate the Matches table
+CREATE TABLE Standings
+(
+	player_id int,
+	tournament_id int NOT NULL,
+	wins int NOT NULL DEFAULT 0,
+	matches int NOT NULL DEFAULT 0,
+	opponent_wins int NOT NULL DEFAULT 0,
+	PRIMARY KEY (player_id),
+	FOREIGN KEY (player_id) REFERENCES Players(player_id) ON DELETE CASCADE
 );
 
+-- matches the Player_Standings ORDER BY
+CREATE INDEX standings_order_idx
+	ON Standings (tournament_id, wins DESC, opponent_wins DESC);
 
--- CREATE VIEWS
--- Player_Wins
-CREATE VIEW Player_Wins AS
-	SELECT winner AS player_id, COUNT(match_id) as wins from Matches
-	GROUP BY winner;
-
--- Player_Losses
-CREATE VIEW Player_Losses AS
-	SELECT loser AS player_id, COUNT(match_id) as losses from Matches
-	GROUP BY loser;
-	
--- Opponent_Wins
-CREATE VIEW Opponent_Wins AS
-	SELECT m.winner AS player_id, SUM(w.wins) AS o_wins FROM Matches AS m INNER JOIN Player_Wins AS w on m.loser=w.player_id
-	GROUP BY m.winner;
 
+-- CREATE FUNCTIONS AND TRIGGERS
+-- create_tournament
+-- adds a tournament and its Matches partition, returns the new id
+CREATE FUNCTION create_tournament(t_name VARCHAR) RETURNS int AS $$
+DECLARE
+	t_id int;
+BEGIN
+	INSERT INTO Tournaments (name) VALUES (t_name)
+		RETURNING tournament_id INTO t_id;
+	EXECUTE format('CREATE TABLE matches_%s PARTITION OF Matches '
+	               'FOR VALUES IN (%s)', t_id, t_id);
+	RETURN t_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- standings_add_player
+-- every new player starts with an empty standings row
+CREATE FUNCTION standings_add_player() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO Standings (player_id, tournament_id)
+		VALUES (NEW.player_id, NEW.tournament_id);
+	RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER players_add_standings AFTER INSERT ON Players
+	FOR EACH ROW EXECUTE PROCEDURE standings_add_player();
+
+-- standings_add_match
+-- credits a new match to both players, then recomputes opponent_wins for
+-- the winner and for everyone who has beaten the winner (their opponent
+-- just gained a win). A BYE has a NULL loser and only credits the winner.
+-- Reports to one tournament take turns on its Tournaments row, so each
+-- recompute runs on a snapshot that includes the matches committed before
+-- it. Without the lock two parallel reports could each miss the other's
+-- win and the later commit would store a stale opponent_wins.
+-- tournament_indexes.sql installs the same function on databases created
+-- from tournament.sql 1.05 to 1.07, keep the two copies in step.
+CREATE FUNCTION standings_add_match() RETURNS trigger AS $$
+BEGIN
+	PERFORM 1 FROM Tournaments WHERE tournament_id = NEW.tournament_id
+		FOR UPDATE;
+	UPDATE Standings SET wins = wins + 1, matches = matches + 1
+		WHERE player_id = NEW.winner;
+	UPDATE Standings SET matches = matches + 1
+		WHERE player_id = NEW.loser;
+	UPDATE Standings AS s SET opponent_wins =
+		(SELECT coalesce(SUM(o.wins), 0) FROM Matches AS m
+		 INNER JOIN Standings AS o ON m.loser=o.player_id
+		 WHERE m.tournament_id = NEW.tournament_id AND m.winner=s.player_id)
+		WHERE s.player_id IN (SELECT NEW.winner
+		                      UNION
+		                      SELECT winner FROM Matches
+		                      WHERE tournament_id = NEW.tournament_id
+		                        AND loser = NEW.winner);
+	RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER matches_add_standings AFTER INSERT ON Matches
+	FOR EACH ROW EXECUTE PROCEDURE standings_add_match();
+
+-- bump_standings_version
+-- one version bump per statement for every tournament in the transition
+-- table, the triggers using it all name their transition table changed
+CREATE FUNCTION bump_standings_version() RETURNS trigger AS $$
+BEGIN
+	UPDATE Tournaments SET standings_version = nextval('standings_version_seq')
+		WHERE tournament_id IN (SELECT DISTINCT tournament_id FROM changed);
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER players_add_version AFTER INSERT ON Players
+	REFERENCING NEW TABLE AS changed
+	FOR EACH STATEMENT EXECUTE PROCEDURE bump_standings_version();
+
+CREATE TRIGGER players_remove_version AFTER DELETE ON Players
+	REFERENCING OLD TABLE AS changed
+	FOR EACH STATEMENT EXECUTE PROCEDURE bump_standings_version();
+
+CREATE TRIGGER matches_add_version AFTER INSERT ON Matches
+	REFERENCING NEW TABLE AS changed
+	FOR EACH STATEMENT EXECUTE PROCEDURE bump_standings_version();
+
+-- rebuild_standings
+-- recomputes the standings rows of one tournament (or of every tournament
+-- when t_id is NULL) from the Matches table. Deleting matches is rare so
+-- it simply rebuilds, run it by hand to recover from drift:
+--   SELECT rebuild_standings(NULL);
+CREATE FUNCTION rebuild_standings(t_id int) RETURNS void AS $$
+BEGIN
+	UPDATE Tournaments SET standings_version = nextval('standings_version_seq')
+		WHERE t_id IS NULL OR tournament_id = t_id;
+	DELETE FROM Standings WHERE t_id IS NULL OR tournament_id = t_id;
+	INSERT INTO Standings (player_id, tournament_id, wins, matches)
+		SELECT p.player_id, p.tournament_id, coalesce(w.wins, 0),
+		       coalesce(w.wins, 0) + coalesce(l.losses, 0)
+		FROM Players AS p
+		 LEFT OUTER JOIN (SELECT winner AS player_id, COUNT(*) AS wins
+		                  FROM Matches WHERE t_id IS NULL OR tournament_id = t_id
+		                  GROUP BY winner) AS w
+		  ON p.player_id=w.player_id
+		 LEFT OUTER JOIN (SELECT loser AS player_id, COUNT(*) AS losses
+		                  FROM Matches WHERE t_id IS NULL OR tournament_id = t_id
+		                  GROUP BY loser) AS l
+		  ON p.player_id=l.player_id
+		WHERE t_id IS NULL OR p.tournament_id = t_id;
+	UPDATE Standings AS s SET opponent_wins = o.o_wins
+		FROM (SELECT m.winner AS player_id, SUM(w.wins) AS o_wins
+		      FROM Matches AS m INNER JOIN Standings AS w on m.loser=w.player_id
+		      WHERE t_id IS NULL OR m.tournament_id = t_id
+		      GROUP BY m.winner) AS o
+		WHERE s.player_id=o.player_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- standings_remove_matches
+-- rebuilds the tournaments that lost matches in a DELETE
+CREATE FUNCTION standings_remove_matches() RETURNS trigger AS $$
+DECLARE
+	t_id int;
+BEGIN
+	FOR t_id IN SELECT DISTINCT tournament_id FROM old_matches LOOP
+		PERFORM rebuild_standings(t_id);
+	END LOOP;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER matches_remove_standings AFTER DELETE ON Matches
+	REFERENCING OLD TABLE AS old_matches
+	FOR EACH STATEMENT EXECUTE PROCEDURE standings_remove_matches();
+
+
+-- CREATE VIEWS
 -- Player_Standings
 CREATE VIEW Player_Standings AS
-	SELECT p.player_id, p.full_name, coalesce(w.wins, 0) as wins, (coalesce(w.wins,0)+coalesce(l.losses,0)) AS matches, coalesce(o.o_wins, 0)  AS opponent_wins
-	FROM Players AS p 
-	 LEFT OUTER JOIN Player_Wins AS w ON p.player_id=w.player_id
-	 LEFT OUTER JOIN Player_Losses AS l ON p.player_id=l.player_id
-	 LEFT OUTER JOIN Opponent_Wins AS o ON p.player_id=o.player_id
-	ORDER BY w.wins DESC, o.o_wins DESC;
+	SELECT p.player_id, s.tournament_id, p.full_name, s.wins, s.matches,
+	       s.opponent_wins
+	FROM Players AS p
+	 INNER JOIN Standings AS s ON p.player_id=s.player_id
+	ORDER BY s.tournament_id, s.wins DESC, s.opponent_wins DESC;
+
+
+-- DEFAULT TOURNAMENT
+-- tournament 1 is used when the python API is not given a tournament
+SELECT create_tournament('Default Tournament');
@@ -0,0 +1,204 @@
+""" Tournament Database (asyncio)
+    UDACITY Full stack Developer Project 2
+    asyncio version of tournament.py on the asyncpg driver, for
+    callers that report results from many tables at once
+    Author: Aron Roberts
+    Version: 1.00
+    Date: 10/18/2026
+    filename: tournament_async.py
+
+    requires Python 3.7+ and asyncpg, every function is a coroutine that
+    returns the same result as its tournament.py counterpart:
+
+        count_players       countPlayers
+        register_player     registerPlayer
+        register_players    registerPlayers
+        report_match        reportMatch
+        report_matches      reportMatches
+        player_standings    playerStandings
+        swiss_pairings      swissPairings
+"""
+
+import asyncio
+import asyncpg
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from swiss import pairPlayers
+from tournament import (DATABASE_NAME, POOL_MIN_CONN, POOL_MAX_CONN,
+                        DEFAULT_TOURNAMENT, _cleanName, _partition)
+
+
+_pool = None
+_pool_lock = None
+_borrowed = ContextVar('borrowed', default=None)
+
+
+async def init_pool(minconn=POOL_MIN_CONN, maxconn=POOL_MAX_CONN,
+                    database_name=DATABASE_NAME):
+    """Creates (or replaces) the module connection pool.
+
+    Called implicitly with the module defaults the first time a connection
+    is borrowed, call it explicitly to change the pool size or database.
+    """
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = await asyncpg.create_pool(database=database_name,
+                                      min_size=minconn, max_size=maxconn)
+    return _pool
+
+
+async def close_pool():
+    """Closes every connection held by the module connection pool."""
+    global _pool, _pool_lock
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+    # the lock belongs to the running loop, the next one makes its own
+    _pool_lock = None
+
+
+async def _get_pool():
+    """Returns the module connection pool, creating it on first use.
+
+    Tasks that make their first call at the same time wait on one lock, so
+    only the first creates a pool and the others share it. The lock is
+    made here rather than at import so it belongs to the running loop.
+    """
+    global _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                await init_pool()
+    return _pool
+
+
+@asynccontextmanager
+async def connection():
+    """Borrows a pooled connection for the duration of an async with block.
+
+    The block runs in one transaction, committed when it exits cleanly and
+    rolled back if it raises. Module functions awaited inside the block
+    reuse the borrowed connection:
+
+        async with connection() as conn:
+            await register_player("Twilight Sparkle")
+            await register_player("Fluttershy")
+    """
+    borrowed = _borrowed.get()
+    if borrowed is not None:
+        # nested use, the outermost block owns the transaction
+        yield borrowed
+        return
+
+    pool = await _get_pool()
+    async with pool.acquire() as conn:
+        token = _borrowed.set(conn)
+        try:
+            async with conn.transaction():
+                yield conn
+        finally:
+            _borrowed.reset(token)
+
+
+async def delete_matches(tournament_id=DEFAULT_TOURNAMENT):
+    """Remove all the match records of a tournament from the database."""
+    async with connection() as conn:
+        await conn.execute("TRUNCATE %s" % _partition(tournament_id))
+        await conn.execute("SELECT rebuild_standings($1)", tournament_id)
+
+
+async def delete_players(tournament_id=DEFAULT_TOURNAMENT):
+    """Remove all the player records of a tournament from the database."""
+    async with connection() as conn:
+        await conn.execute("TRUNCATE %s" % _partition(tournament_id))
+        await conn.execute("DELETE FROM Players WHERE tournament_id = $1",
+                           tournament_id)
+
+
+async def count_players(tournament_id=DEFAULT_TOURNAMENT):
+    """Returns the number of players currently registered."""
+    async with connection() as conn:
+        return await conn.fetchval("SELECT count(player_id) FROM players "
+                                   "WHERE tournament_id = $1", tournament_id)
+
+
+async def register_player(name, tournament_id=DEFAULT_TOURNAMENT):
+    """Adds a player to the tournament database."""
+    name = _cleanName(name)
+    async with connection() as conn:
+        await conn.execute("INSERT INTO players (tournament_id, full_name) "
+                           "VALUES($1, $2)", tournament_id, name)
+
+
+async def register_players(names, tournament_id=DEFAULT_TOURNAMENT):
+    """Adds many players in one transaction, returns their ids in order."""
+    names = [_cleanName(name) for name in names]
+    if not names:
+        return []
+    async with connection() as conn:
+        ids = [row[0] for row in await conn.fetch(
+            "SELECT nextval(pg_get_serial_sequence('players', 'player_id')) "
+            "FROM generate_series(1, $1)", len(names))]
+        await conn.copy_records_to_table(
+            'players', columns=['player_id', 'tournament_id', 'full_name'],
+            records=[(i, tournament_id, name)
+                     for (i, name) in zip(ids, names)])
+    return ids
+
+
+async def player_standings(tournament_id=DEFAULT_TOURNAMENT):
+    """Returns a list of (id, name, wins, matches), sorted by wins."""
+    async with connection() as conn:
+        rows = await conn.fetch("SELECT player_id, full_name, wins, matches "
+                                "FROM Player_Standings "
+                                "WHERE tournament_id = $1", tournament_id)
+    return [(row[0], row[1], int(row[2]), int(row[3])) for row in rows]
+
+
+async def report_match(winner, loser, tournament_id=DEFAULT_TOURNAMENT):
+    """Records the outcome of a single match, loser 0 for a BYE."""
+    await report_matches([(winner, loser)], tournament_id)
+
+
+async def report_matches(pairs, tournament_id=DEFAULT_TOURNAMENT):
+    """Records a whole round of (winner, loser) results at once.
+
+    Returns the number of matches recorded, see reportMatches().
+    """
+    pairs = [(int(winner), int(loser)) for (winner, loser) in pairs]
+    if not pairs:
+        return 0
+    ids = list(set([p for pair in pairs for p in pair if p != 0]))
+    async with connection() as conn:
+        players = set([row[0] for row in await conn.fetch(
+            "SELECT player_id FROM players "
+            "WHERE tournament_id = $1 AND player_id = ANY($2::int[])",
+            tournament_id, ids)])
+        # a BYE is stored as a match with no loser
+        matches = [(tournament_id, winner, loser or None)
+                   for (winner, loser) in pairs
+                   if winner in players and winner != loser and
+                   (loser in players or loser == 0)]
+        if matches:
+            await conn.executemany(
+                "INSERT INTO matches (tournament_id, winner, loser) "
+                "VALUES ($1, $2, $3)", matches)
+    return len(matches)
+
+
+async def swiss_pairings(tournament_id=DEFAULT_TOURNAMENT):
+    """Returns a list of (id1, name1, id2, name2) for the next round."""
+    async with connection() as conn:
+        players = await conn.fetch("SELECT player_id, full_name, wins "
+                                   "FROM Player_Standings "
+                                   "WHERE tournament_id = $1", tournament_id)
+        matches = await conn.fetch("SELECT winner, loser FROM Matches "
+                                   "WHERE tournament_id = $1", tournament_id)
+    history = [(winner, loser) for (winner, loser) in matches
+               if loser is not None]
+    byes = [winner for (winner, loser) in matches if loser is None]
+    return pairPlayers([tuple(row) for row in players], history, byes)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# Test cases for tournament_async.py, checked against tournament.py
+
+import asyncio
+
+import tournament
+from tournament import POOL_MAX_CONN
+from tournament_async import *
+
+
+async def testAsyncRegisterCount():
+    await delete_matches()
+    await delete_players()
+    await register_player("Chandra Nalaar")
+    ids = await register_players(["Markov Chaney", "Joe Malik"])
+    c = await count_players()
+    if c != 3 or tournament.countPlayers() != 3:
+        raise ValueError(
+            "After three players register, count_players() should be 3.")
+    if len(ids) != 2:
+        raise ValueError("register_players() should return one id each.")
+    print("1. Players registered with the async API are counted.")
+
+
+async def testAsyncStandingsMatchSync():
+    await delete_matches()
+    await delete_players()
+    ids = await register_players(["Bruno Walton", "Boots O'Neal",
+                                  "Cathy Burton", "Diane Grant",
+                                  "Melpomene Murray"])
+    await asyncio.gather(report_match(ids[0], ids[1]),
+                         report_match(ids[2], ids[3]),
+                         report_match(ids[4], 0))
+    standings = await player_standings()
+    if sorted(standings) != sorted(tournament.playerStandings()):
+        raise ValueError(
+            "player_standings() should match playerStandings().")
+    pairings = set(frozenset([p[0], p[2]]) for p in await swiss_pairings())
+    if pairings != set(frozenset([p[0], p[2]])
+                       for p in tournament.swissPairings()):
+        raise ValueError("swiss_pairings() should match swissPairings().")
+    print("2. Async standings and pairings match the sync API.")
+
+
+async def testAsyncRollback():
+    await delete_matches()
+    await delete_players()
+    try:
+        async with connection():
+            await register_player("Spike")
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    if await count_players() != 0:
+        raise ValueError(
+            "Work inside a failed connection() block should roll back.")
+    print("3. A failed async connection() block rolls back.")
+
+
+async def testAsyncPoolFirstUse():
+    await close_pool()
+    before = backends()
+    await asyncio.gather(*[count_players() for i in range(20)])
+    if backends() - before > POOL_MAX_CONN:
+        raise ValueError(
+            "Tasks borrowing at the same time should share one new pool.")
+    print("4. Tasks making their first call together share one pool.")
+
+
+def backends():
+    """Returns the number of server connections to the test database."""
+    db, c = tournament.connect()
+    c.execute("SELECT count(*) FROM pg_stat_activity "
+              "WHERE datname = current_database()")
+    count = c.fetchone()[0]
+    db.close()
+    return count
+
+
+async def main():
+    await testAsyncRegisterCount()
+    await testAsyncStandingsMatchSync()
+    await testAsyncRollback()
+    await testAsyncPoolFirstUse()
+    await close_pool()
+    print("Success!  All tests pass!")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
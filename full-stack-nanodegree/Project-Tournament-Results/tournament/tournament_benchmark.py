@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+""" Tournament Benchmark
+    UDACITY Full stack Developer Project 2
+    Runs synthetic swiss tournaments through the tournament.py API and
+    reports latency percentiles and throughput for every operation
+    Author: Aron Roberts
+    Version: 1.01
+    Date: 10/18/2026
+    filename: tournament_benchmark.py
+
+    usage: python tournament_benchmark.py [-s 16,1024] [-r rounds]
+                                          [--seed n] [-o results.json]
+                                          [-c old.json]
+
+    Every field size gets its own tournament, which is deleted afterwards.
+    Each round the pairings are drawn, the first SINGLE_REPORTS results are
+    reported one at a time with reportMatch() and the rest with one
+    reportMatches() call, then the standings are read twice (the second
+    read is served from the standings cache). Match results are drawn
+    from a generator seeded per field size with --seed, so runs with the
+    same seed play the same tournaments.
+
+    Results are written as JSON so runs from two commits can be compared,
+    -c prints the change in median latency against an earlier run.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+import tournament
+
+
+SIZES = [16, 128, 1024, 10000, 100000]
+SINGLE_REPORTS = 50
+SEED = 2016
+
+
+class Timer(object):
+    """Collects the latency of each call to one operation."""
+
+    def __init__(self):
+        self.samples = []
+        self.items = 0
+
+    def time(self, func, *args, **kw):
+        """Calls func, records how long it took and returns its result."""
+        start = time.time()
+        result = func(*args, **kw)
+        self.samples.append(time.time() - start)
+        return result
+
+    def percentile(self, p):
+        """Returns the p-th percentile latency in ms (nearest rank)."""
+        ordered = sorted(self.samples)
+        rank = max(int(math.ceil(p / 100.0 * len(ordered))), 1)
+        return ordered[rank - 1] * 1000
+
+    def summary(self):
+        total = sum(self.samples)
+        return {
+            'calls': len(self.samples),
+            'items': self.items,
+            'total_s': round(total, 6),
+            'p50_ms': round(self.percentile(50), 3),
+            'p90_ms': round(self.percentile(90), 3),
+            'p99_ms': round(self.percentile(99), 3),
+            'max_ms': round(max(self.samples) * 1000, 3),
+            'calls_per_s': round(len(self.samples) / total, 1),
+            'items_per_s': round(self.items / total, 1),
+        }
+
+
+def runTournament(players, rounds, seed=SEED):
+    """Plays one synthetic tournament, returns the summary per operation.
+
+    The match results are drawn from a random generator seeded with seed.
+    """
+    rng = random.Random(seed)
+    timers = dict((op, Timer()) for op in
+                  ['createTournament', 'registerPlayers', 'swissPairings',
+                   'reportMatch', 'reportMatches', 'playerStandings',
+                   'playerStandings_cached', 'deleteTournament'])
+    t = timers['createTournament'].time(tournament.createTournament,
+                                        "Benchmark %d" % players)
+    try:
+        names = ["Player %d" % i for i in range(players)]
+        timers['registerPlayers'].time(tournament.registerPlayers, names, t)
+        timers['registerPlayers'].items += players
+
+        for r in range(rounds):
+            pairings = timers['swissPairings'].time(tournament.swissPairings,
+                                                    t)
+            timers['swissPairings'].items += len(pairings)
+            results = []
+            for (id1, name1, id2, name2) in pairings:
+                if id2 == 0 or rng.random() < 0.5:
+                    results.append((id1, id2))
+                else:
+                    results.append((id2, id1))
+
+            for (winner, loser) in results[:SINGLE_REPORTS]:
+                timers['reportMatch'].time(tournament.reportMatch,
+                                           winner, loser, t)
+                timers['reportMatch'].items += 1
+            if results[SINGLE_REPORTS:]:
+                timers['reportMatches'].time(tournament.reportMatches,
+                                             results[SINGLE_REPORTS:], t)
+                timers['reportMatches'].items += len(results[SINGLE_REPORTS:])
+
+            for op in ['playerStandings', 'playerStandings_cached']:
+                timers[op].time(tournament.playerStandings, t)
+                timers[op].items += players
+    finally:
+        timers['deleteTournament'].time(tournament.deleteTournament, t)
+
+    return dict((op, timer.summary())
+                for (op, timer) in timers.items() if timer.samples)
+
+
+def gitCommit():
+    """Returns the current git commit of the working tree, if any."""
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                           stderr=devnull).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Prints the change in median latency per operation between runs."""
+    if old.get('seed') != new.get('seed'):
+        print("warning: seeds differ (%s, %s), the runs played different "
+              "tournaments" % (old.get('seed'), new.get('seed')))
+    old_runs = dict((run['players'], run) for run in old['runs'])
+    for run in new['runs']:
+        base = old_runs.get(run['players'])
+        if base is None:
+            continue
+        for op in sorted(run['operations']):
+            if op not in base['operations']:
+                continue
+            before = base['operations'][op]['p50_ms']
+            after = run['operations'][op]['p50_ms']
+            change = (after - before) / before * 100 if before else 0.0
+            print("%7d players  %-24s p50 %10.3f -> %10.3f ms  %+7.1f%%" %
+                  (run['players'], op, before, after, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('-s', '--sizes',
+                        default=','.join(str(n) for n in SIZES),
+                        help="comma separated field sizes")
+    parser.add_argument('-r', '--rounds', type=int,
+                        help="rounds per tournament (default log2 players)")
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help="seed of the match results (default %d)" % SEED)
+    parser.add_argument('-o', '--output', help="write the results here")
+    parser.add_argument('-c', '--compare', help="earlier results to compare")
+    args = parser.parse_args()
+
+    results = {
+        'commit': gitCommit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'seed': args.seed,
+        'runs': [],
+    }
+    for players in [int(n) for n in args.sizes.split(',')]:
+        rounds = args.rounds or int(math.ceil(math.log(players, 2)))
+        start = time.time()
+        operations = runTournament(players, rounds, args.seed)
+        results['runs'].append({'players': players, 'rounds': rounds,
+                                'operations': operations})
+        print("%d players, %d rounds in %.1fs" %
+              (players, rounds, time.time() - start))
+        for op in sorted(operations):
+            summary = operations[op]
+            print("    %-24s p50 %10.3f  p99 %10.3f ms  %12.1f items/s" %
+                  (op, summary['p50_ms'], summary['p99_ms'],
+                   summary['items_per_s']))
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    tournament.closePool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+""" Tournament Index Check
+    UDACITY Full stack Developer Project 2
+    Loads a large synthetic match history and checks with EXPLAIN that
+    the standings queries use the indexes from tournament.sql
+    Author: Aron Roberts
+    Version: 1.01
+    Date: 10/18/2026
+    filename: tournament_explain.py
+
+    Last Update: 10/18/2026
+    loads the history into its own tournament partition
+
+    usage: python tournament_explain.py [matches] [players]
+
+    Everything runs in one transaction that is rolled back at the end,
+    so the database is left as it was found. The history goes into a new
+    tournament, its match triggers are disabled while loading and the
+    standings are rebuilt once instead.
+"""
+
+import sys
+
+from tournament import connection, _partition
+
+
+MATCHES = 1000000
+PLAYERS = 10000
+
+# (description, query, index expected in the plan). Indexes on the Matches
+# partitions are named after the partition and columns, matches_2_... etc.
+CHECKS = [
+    ("Players who beat a player use the (loser, winner) index",
+     "SELECT winner FROM Matches "
+     "WHERE tournament_id = %(tournament)s AND loser = %(player)s",
+     "_loser_winner_idx"),
+    ("Players beaten by a player use the (winner, loser) index",
+     "SELECT loser FROM Matches "
+     "WHERE tournament_id = %(tournament)s AND winner = %(player)s",
+     "_winner_loser_idx"),
+    ("Top of the standings uses standings_order_idx",
+     "SELECT player_id FROM Player_Standings "
+     "WHERE tournament_id = %(tournament)s LIMIT 16",
+     "standings_order_idx"),
+]
+
+
+def loadMatches(c, matches, players):
+    """Creates a tournament with random matches between its players.
+
+    Returns the tournament id and the list of player ids.
+    """
+    c.execute("SELECT create_tournament('Index Check')")
+    tournament_id = c.fetchone()[0]
+    c.execute("ALTER TABLE %s DISABLE TRIGGER USER" %
+              _partition(tournament_id))
+    c.execute("INSERT INTO Players (tournament_id, full_name) "
+              "SELECT %s, 'Player ' || i FROM generate_series(1, %s) AS i "
+              "RETURNING player_id", (tournament_id, players))
+    ids = [row[0] for row in c.fetchall()]
+    c.execute("INSERT INTO Matches (tournament_id, winner, loser) "
+              "SELECT %(tournament)s, ids[1 + w], ids[1 + (w + 1 + "
+              "floor(random() * (%(n)s - 1))::int) %% %(n)s] "
+              "FROM (SELECT %(ids)s::int[] AS ids, "
+              "floor(random() * %(n)s)::int AS w "
+              "FROM generate_series(1, %(matches)s)) AS g",
+              {'tournament': tournament_id, 'ids': ids, 'n': len(ids),
+               'matches': matches})
+    c.execute("SELECT rebuild_standings(%s)", (tournament_id,))
+    c.execute("ANALYZE Players")
+    c.execute("ANALYZE Matches")
+    c.execute("ANALYZE Standings")
+    return tournament_id, ids
+
+
+def explain(c, query, params):
+    """Returns the text of the query plan for query."""
+    c.execute("EXPLAIN " + query, params)
+    return "\n".join(row[0] for row in c.fetchall())
+
+
+def main(matches=MATCHES, players=PLAYERS):
+    with connection() as (db, c):
+        try:
+            tournament_id, ids = loadMatches(c, matches, players)
+            print("Loaded %d matches between %d players." %
+                  (matches, players))
+            params = {'tournament': tournament_id,
+                      'player': ids[len(ids) // 2]}
+            for i, (desc, query, index) in enumerate(CHECKS):
+                plan = explain(c, query, params)
+                if index not in plan:
+                    raise ValueError("%s\n%s" % (desc, plan))
+                print("%d. %s." % (i + 1, desc))
+        finally:
+            db.rollback()
+    print("Success!  All queries use their indexes!")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,147 @@
+-- Index migration for the tournament project.
+-- Author: Aron Roberts
+-- Version: 1.03
+-- Date Created: 10/18/2026
+-- filename: tournament_indexes.sql
+--
+-- Last Update: 10/18/2026
+-- states the schema versions it targets, skips Standings when the
+-- database has no Standings table and stops on multi tournament schemas
+-- corrected the version table, 1.05 and 1.06 schemas get the
+-- (tournament_id, ...) Matches indexes instead of stopping
+-- replaces standings_add_match on 1.05 and later schemas
+--
+-- Brings the indexes of a database created from an older tournament.sql
+-- up to date without locking out writes. Safe to run more than once.
+-- Targets:
+--   1.02 and older  no indexes, gets Matches (winner, loser) and
+--                   (loser, winner), these schemas have no Standings table
+--   1.03            no indexes, gets the Matches indexes and
+--                   standings_order_idx
+--   1.04            already indexed by tournament.sql, nothing changes
+--   1.05, 1.06      Matches carries tournament_id and is partitioned, its
+--                   (winner, loser) and (loser, winner) indexes are
+--                   replaced by the (tournament_id, winner, loser) and
+--                   (tournament_id, loser, winner) indexes of 1.07
+--   1.07 and later  already indexed by tournament.sql, nothing changes
+-- On 1.05 and later schemas standings_add_match is also replaced by the
+-- version of the current tournament.sql, which finds its rows through
+-- the (tournament_id, ...) indexes and locks the tournament row so
+-- parallel reports keep opponent_wins exact.
+-- run command `psql tournament -f tournament_indexes.sql`
+-- (psql 10 or later, the checks use \if)
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction, do not
+-- wrap this file in BEGIN / COMMIT or run it with psql -1
+
+SELECT to_regclass('standings') IS NOT NULL AS has_standings,
+       EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'matches'
+                 AND column_name = 'tournament_id') AS has_tournaments,
+       EXISTS (SELECT 1 FROM pg_index AS i
+               INNER JOIN pg_attribute AS a
+                ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+               WHERE i.indexrelid = to_regclass('matches_winner_idx')
+                 AND a.attname = 'tournament_id') AS tournament_indexed
+\gset
+
+\if :has_tournaments
+-- standings_add_match of tournament.sql 1.08, keep the two in step
+CREATE OR REPLACE FUNCTION standings_add_match() RETURNS trigger AS $$
+BEGIN
+	PERFORM 1 FROM Tournaments WHERE tournament_id = NEW.tournament_id
+		FOR UPDATE;
+	UPDATE Standings SET wins = wins + 1, matches = matches + 1
+		WHERE player_id = NEW.winner;
+	UPDATE Standings SET matches = matches + 1
+		WHERE player_id = NEW.loser;
+	UPDATE Standings AS s SET opponent_wins =
+		(SELECT coalesce(SUM(o.wins), 0) FROM Matches AS m
+		 INNER JOIN Standings AS o ON m.loser=o.player_id
+		 WHERE m.tournament_id = NEW.tournament_id AND m.winner=s.player_id)
+		WHERE s.player_id IN (SELECT NEW.winner
+		                      UNION
+		                      SELECT winner FROM Matches
+		                      WHERE tournament_id = NEW.tournament_id
+		                        AND loser = NEW.winner);
+	RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+\if :tournament_indexed
+\echo Matches indexes already lead with tournament_id (tournament.sql 1.07 or later), nothing to do
+\else
+-- 1.05 and 1.06, partitioned Matches
+-- A partitioned table cannot be indexed concurrently. The new index is
+-- created on the parent only (invalid, no data), each partition is
+-- indexed concurrently and attached to it, which makes it valid. The old
+-- index is then dropped and the new one renamed, a brief lock on Matches.
+-- Partitions added while this runs get the new index from the parent.
+-- If a run is interrupted, drop any invalid matches_<id>_t_*_idx index
+-- left by CREATE INDEX CONCURRENTLY and run the file again.
+CREATE INDEX IF NOT EXISTS matches_t_winner_idx
+	ON ONLY Matches (tournament_id, winner, loser);
+CREATE INDEX IF NOT EXISTS matches_t_loser_idx
+	ON ONLY Matches (tournament_id, loser, winner);
+
+-- partitions that have no index attached to the new ones yet
+CREATE TEMPORARY VIEW unindexed_partitions AS
+	SELECT part.relname AS partition, ix.name, ix.cols
+	FROM pg_inherits AS i
+	 INNER JOIN pg_class AS part ON part.oid = i.inhrelid
+	 CROSS JOIN (VALUES ('winner', 'tournament_id, winner, loser'),
+	                    ('loser', 'tournament_id, loser, winner'))
+	  AS ix (name, cols)
+	WHERE i.inhparent = 'matches'::regclass
+	  AND NOT EXISTS (SELECT 1 FROM pg_inherits AS a
+	                  INNER JOIN pg_index AS pi ON pi.indexrelid = a.inhrelid
+	                  WHERE a.inhparent =
+	                        format('matches_t_%s_idx', ix.name)::regclass
+	                    AND pi.indrelid = part.oid);
+
+SELECT format('CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I (%s)',
+              partition || '_t_' || name || '_idx', partition, cols)
+	FROM unindexed_partitions ORDER BY partition, name
+\gexec
+
+SELECT format('ALTER INDEX %I ATTACH PARTITION %I',
+              'matches_t_' || name || '_idx',
+              partition || '_t_' || name || '_idx')
+	FROM unindexed_partitions ORDER BY partition, name
+\gexec
+
+SELECT bool_and(indisvalid) AS attached FROM pg_index
+	WHERE indexrelid IN (to_regclass('matches_t_winner_idx'),
+	                     to_regclass('matches_t_loser_idx'))
+\gset
+
+\if :attached
+BEGIN;
+DROP INDEX matches_winner_idx;
+DROP INDEX matches_loser_idx;
+ALTER INDEX matches_t_winner_idx RENAME TO matches_winner_idx;
+ALTER INDEX matches_t_loser_idx RENAME TO matches_loser_idx;
+COMMIT;
+ANALYZE Matches;
+\else
+\echo some partitions could not be indexed, the old Matches indexes are kept, see the notes above and run the file again
+\endif
+\endif
+\quit
+\endif
+
+-- Matches, 1.04 and older
+CREATE INDEX CONCURRENTLY IF NOT EXISTS matches_winner_idx
+	ON Matches (winner, loser);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS matches_loser_idx
+	ON Matches (loser, winner);
+ANALYZE Matches;
+
+-- Standings, added by tournament.sql 1.03
+\if :has_standings
+CREATE INDEX CONCURRENTLY IF NOT EXISTS standings_order_idx
+	ON Standings (wins DESC, opponent_wins DESC);
+ANALYZE Standings;
+\else
+\echo no Standings table (tournament.sql 1.02 or older), skipped standings_order_idx
+\endif
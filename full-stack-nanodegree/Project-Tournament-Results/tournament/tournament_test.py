@@ -2,6 +2,10 @@
 #
 # Test cases for tournament.py
 
+import psycopg2.extensions
+import threading
+import time
+
 from tournament import *
 
 def testDeleteMatches():
@@ -125,6 +129,302 @@ def testPairings():
     print "8. After one match, players with one win are paired."
 
 
+def testSharedConnection():
+    deleteMatches()
+    deletePlayers()
+    with connection() as (db, c):
+        registerPlayer("Rarity")
+        registerPlayer("Rainbow Dash")
+        c = countPlayers()
+    if c != 2:
+        raise ValueError(
+            "Calls inside connection() should see each other's writes.")
+    try:
+        with connection() as (db, c):
+            registerPlayer("Spike")
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    if countPlayers() != 2:
+        raise ValueError(
+            "Work inside a failed connection() block should roll back.")
+    print "9. Operations can share one pooled connection and transaction."
+
+
+def testRegisterPlayers():
+    deleteMatches()
+    deletePlayers()
+    names = ["Player %d" % i for i in range(2500)]
+    ids = registerPlayers(names)
+    if len(ids) != len(names) or len(set(ids)) != len(names):
+        raise ValueError(
+            "registerPlayers() should return one unique id per player.")
+    if countPlayers() != len(names):
+        raise ValueError(
+            "After a bulk registration, countPlayers() should count all.")
+    registered = dict((i, n) for (i, n, w, m) in playerStandings())
+    if [registered[i] for i in ids] != names:
+        raise ValueError(
+            "registerPlayers() should return ids in the order of the names.")
+    [i] = registerPlayers(["<b>Rarity</b>"])
+    if dict((p, n) for (p, n, w, m) in playerStandings())[i] != "Rarity":
+        raise ValueError("registerPlayers() should strip markup from names.")
+    print "10. Players can be registered in bulk."
+
+
+def testReportMatchesBatch():
+    deleteMatches()
+    deletePlayers()
+    ids = registerPlayers(["Celestia", "Luna", "Cadance", "Shining Armor",
+                           "Discord"])
+    recorded = reportMatches([(ids[0], ids[1]), (ids[2], ids[3]),
+                              (ids[4], 0), (ids[0], -1)])
+    if recorded != 3:
+        raise ValueError(
+            "reportMatches() should skip pairs with unregistered players.")
+    for (i, n, w, m) in playerStandings():
+        if m != 1:
+            raise ValueError("Each player should have one match recorded.")
+        if i in (ids[0], ids[2], ids[4]) and w != 1:
+            raise ValueError("Each match winner should have one win recorded.")
+        elif i in (ids[1], ids[3]) and w != 0:
+            raise ValueError("Each match loser should have zero wins recorded.")
+    print "11. A whole round of matches can be reported at once."
+
+
+def testRebuildStandings():
+    deleteMatches()
+    deletePlayers()
+    ids = registerPlayers(["Starlight Glimmer", "Trixie", "Sunburst",
+                           "Maud Pie"])
+    reportMatches([(ids[0], ids[1]), (ids[2], ids[3])])
+    reportMatches([(ids[0], ids[2]), (ids[1], ids[3])])
+    before = playerStandings()
+    rebuildStandings()
+    if sorted(playerStandings()) != sorted(before):
+        raise ValueError(
+            "Rebuilding the standings should not change them.")
+    if before[0][0] != ids[0] or before[0][2] != 2:
+        raise ValueError(
+            "The player with two wins should lead the standings.")
+    print "12. Standings are maintained incrementally and can be rebuilt."
+
+
+def testPairingsNoRematch():
+    deleteMatches()
+    deletePlayers()
+    [id1, id2, id3, id4] = registerPlayers(["Big Mac", "Granny Smith",
+                                            "Zecora", "Cheerilee"])
+    reportMatches([(id1, id2), (id3, id4)])
+    reportMatches([(id1, id3), (id2, id4)])
+    pairings = swissPairings()
+    correct_pairs = set([frozenset([id1, id4]), frozenset([id2, id3])])
+    actual_pairs = set([frozenset([p[0], p[2]]) for p in pairings])
+    if correct_pairs != actual_pairs:
+        raise ValueError(
+            "swissPairings() should not pair players who already played.")
+    registerPlayers(["Derpy"])
+    byes = set()
+    for i in range(3):
+        bye = [p[0] for p in swissPairings() if p[2] == 0]
+        if len(bye) != 1 or bye[0] in byes:
+            raise ValueError(
+                "With an odd field, a different player should get each BYE.")
+        byes.add(bye[0])
+        reportMatch(bye[0], 0)
+    print "13. Pairings avoid rematches and repeat BYEs."
+
+
+def testTournaments():
+    deleteMatches()
+    deletePlayers()
+    t1 = createTournament("Summer Sun Celebration")
+    t2 = createTournament("Running of the Leaves")
+    try:
+        a = registerPlayers(["Lyra", "Bon Bon"], t1)
+        b = registerPlayers(["Octavia", "Vinyl Scratch", "Doctor Hooves"], t2)
+        if countPlayers(t1) != 2 or countPlayers(t2) != 3:
+            raise ValueError(
+                "countPlayers() should only count the tournament's players.")
+        if countPlayers() != 0:
+            raise ValueError(
+                "Other tournaments should not register default players.")
+        if reportMatches([(a[0], b[0])], t1) != 0:
+            raise ValueError(
+                "Players from different tournaments should not be matched.")
+        reportMatch(a[0], a[1], t1)
+        reportMatch(b[0], b[1], t2)
+        deleteMatches(t1)
+        if [m for (i, n, w, m) in playerStandings(t1)] != [0, 0]:
+            raise ValueError(
+                "deleteMatches() should reset the tournament's standings.")
+        if sorted(m for (i, n, w, m) in playerStandings(t2)) != [0, 1, 1]:
+            raise ValueError(
+                "deleteMatches() should not touch other tournaments.")
+        deletePlayers(t2)
+        if countPlayers(t2) != 0 or countPlayers(t1) != 2:
+            raise ValueError(
+                "deletePlayers() should only remove the tournament's players.")
+    finally:
+        deleteTournament(t1)
+        deleteTournament(t2)
+    print "14. Tournaments are kept apart from each other."
+
+
+def testStandingsCache():
+    deleteMatches()
+    deletePlayers()
+    [id1, id2] = registerPlayers(["Flim", "Flam"])
+    first = playerStandings()
+    if playerStandings() != first:
+        raise ValueError("Repeated standings reads should agree.")
+    # a write from another process only shows up as a new version
+    db, c = connect()
+    c.execute("INSERT INTO matches (tournament_id, winner, loser) "
+              "VALUES(%s, %s, %s)", (DEFAULT_TOURNAMENT, id1, id2))
+    db.commit()
+    db.close()
+    wins = dict((i, w) for (i, n, w, m) in playerStandings())
+    if wins != {id1: 1, id2: 0}:
+        raise ValueError(
+            "Cached standings should refresh after another writer's match.")
+    print "15. Cached standings follow writes from other connections."
+
+
+def testConcurrentReports():
+    deleteMatches()
+    deletePlayers()
+    [p, q, r, x, y] = registerPlayers(["Sunset Shimmer", "Sci-Twi",
+                                       "Sour Sweet", "Sugarcoat",
+                                       "Indigo Zap"])
+    reportMatches([(q, p), (q, r)])
+    # p and r both win at once, each report recomputes q's opponent wins
+    db1, c1 = connect()
+    db2, c2 = connect()
+    c1.execute("INSERT INTO matches (tournament_id, winner, loser) "
+               "VALUES(%s, %s, %s)", (DEFAULT_TOURNAMENT, p, x))
+
+    def report():
+        c2.execute("INSERT INTO matches (tournament_id, winner, loser) "
+                   "VALUES(%s, %s, %s)", (DEFAULT_TOURNAMENT, r, y))
+        db2.commit()
+    second = threading.Thread(target=report)
+    second.start()
+    time.sleep(0.5)
+    db1.commit()
+    second.join()
+    db1.close()
+    db2.close()
+    c = connect()[1]
+    query = ("SELECT player_id, wins, matches, opponent_wins FROM Standings "
+             "WHERE tournament_id = %s ORDER BY player_id")
+    c.execute(query, (DEFAULT_TOURNAMENT,))
+    before = c.fetchall()
+    rebuildStandings(DEFAULT_TOURNAMENT)
+    c.execute(query, (DEFAULT_TOURNAMENT,))
+    if c.fetchall() != before:
+        raise ValueError(
+            "Concurrent reports should keep opponent wins up to date.")
+    c.connection.close()
+    print "16. Concurrent reports to one tournament keep the standings exact."
+
+
+def testPoolReconnect():
+    deleteMatches()
+    deletePlayers()
+    # the pool opens three connections up front, drop them server side
+    # like a restart would
+    initPool(3, 5)
+    try:
+        db, c = connect()
+        c.execute("SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                  "WHERE datname = current_database() "
+                  "AND pid <> pg_backend_pid()")
+        db.close()
+        registerPlayer("Pinkie Pie")
+        if countPlayers() != 1:
+            raise ValueError(
+                "Pooled connections should reconnect after a restart.")
+    finally:
+        initPool()
+    print "17. Pooled connections reconnect after the server drops them."
+
+
+def testPoolWaits():
+    initPool(1, 2)
+    release = threading.Event()
+    done = []
+
+    def hold():
+        with connection():
+            release.wait()
+
+    def count():
+        done.append(countPlayers())
+    try:
+        holders = [threading.Thread(target=hold) for i in range(2)]
+        for t in holders:
+            t.start()
+        time.sleep(0.2)
+        waiter = threading.Thread(target=count)
+        waiter.start()
+        time.sleep(0.3)
+        if done:
+            raise ValueError(
+                "A caller over the pool limit should wait for a connection.")
+        release.set()
+        waiter.join()
+        for t in holders:
+            t.join()
+        if len(done) != 1:
+            raise ValueError(
+                "A waiting caller should get the next free connection.")
+    finally:
+        release.set()
+        initPool()
+    print "18. Callers over the pool limit wait for a free connection."
+
+
+def testPoolFirstUse():
+    closePool()
+    errors = []
+
+    def count():
+        try:
+            countPlayers()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=count) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise ValueError(
+            "Threads borrowing at the same time should share one new pool.")
+    print "19. Threads making their first call together share one pool."
+
+
+def testPoolKeepsCancelled():
+    initPool(1, 1)
+    try:
+        try:
+            with connection() as (db, c):
+                first = db
+                c.execute("SET LOCAL statement_timeout = 10")
+                c.execute("SELECT pg_sleep(1)")
+        except psycopg2.extensions.QueryCanceledError:
+            pass
+        with connection() as (db, c):
+            if db is not first:
+                raise ValueError(
+                    "A cancelled statement should not discard a healthy "
+                    "connection.")
+    finally:
+        initPool()
+    print "20. Timeouts and deadlocks keep their pooled connection."
+
+
 if __name__ == '__main__':
     testDeleteMatches()
     testDelete()
@@ -134,6 +434,18 @@ if __name__ == '__main__':
     testStandingsBeforeMatches()
     testReportMatches()
     testPairings()
+    testSharedConnection()
+    testRegisterPlayers()
+    testReportMatchesBatch()
+    testRebuildStandings()
+    testPairingsNoRematch()
+    testTournaments()
+    testStandingsCache()
+    testConcurrentReports()
+    testPoolReconnect()
+    testPoolWaits()
+    testPoolFirstUse()
+    testPoolKeepsCancelled()
     print "Success!  All tests pass!"
 
 